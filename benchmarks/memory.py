@@ -0,0 +1,128 @@
+"""Memory taken by model objects at million-instance scale
+
+Creates 1M accounts and 100k taps (each with its bucket) and compares the
+memory their slotted instances take with the same attribute values held by
+per-instance __dict__ objects, i.e. the layout the classes had before
+__slots__. Also compares the bytes per holder of the dict ledger of
+ERC20Token and of IndexedBalances after minting to and transferring between
+200k holders. Run from the repository root: python -m benchmarks.memory
+"""
+import argparse
+import gc
+import tracemalloc
+from datetime import datetime
+
+from models.account import Account
+from models.dao import Bucket, Tap
+from models.registry import Registry
+from models.tokens import ERC20Token, IndexedERC20Token
+
+
+class DictObject:
+    """Baseline holding the attributes of a model object in its __dict__"""
+
+
+def _slot_names(cls):
+    return [
+        name for klass in cls.__mro__
+        for name in getattr(klass, '__slots__', ()) if name != '__weakref__'
+    ]
+
+
+def _as_dict_object(obj) -> DictObject:
+    twin = DictObject()
+    for name in _slot_names(type(obj)):
+        if hasattr(obj, name):
+            setattr(twin, name, getattr(obj, name))
+    return twin
+
+
+def _as_slotted(obj):
+    twin = type(obj).__new__(type(obj))
+    for name in _slot_names(type(obj)):
+        if hasattr(obj, name):
+            setattr(twin, name, getattr(obj, name))
+    return twin
+
+
+def _allocated(build) -> int:
+    """Returns the bytes still allocated by the objects build returns"""
+    gc.collect()
+    tracemalloc.start()
+    objects = build()
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return allocated
+
+
+def create_model(accounts: int, taps: int):
+    token = ERC20Token()
+    holders = [Account() for _ in range(accounts)]
+    buckets = [
+        Bucket(name=f'Bucket {i}', withdraw_begin=datetime(2019, 1, 1), token=token)
+        for i in range(taps)
+    ]
+    return holders + buckets + [
+        Tap(withdrawer=holder, bucket=bucket, rate=1) for holder, bucket in zip(holders, buckets)
+    ]
+
+
+def run(accounts: int = 1000000, taps: int = 100000) -> dict:
+    """Returns the bytes taken by the objects with __slots__ and with __dict__"""
+    with Registry():
+        objects = create_model(accounts, taps)
+
+    slotted = _allocated(lambda: [_as_slotted(obj) for obj in objects])
+    with_dict = _allocated(lambda: [_as_dict_object(obj) for obj in objects])
+    return {
+        'objects': len(objects),
+        'slots_bytes': slotted,
+        'dict_bytes': with_dict,
+        'reduction': 1 - slotted / with_dict,
+    }
+
+
+def ledger_bytes(token_class, holders: list) -> int:
+    """Returns the bytes taken by a token_class ledger holding tokens of holders"""
+    def build():
+        token = token_class()
+        token.mint_many(holders, list(range(1000, 1000 + len(holders))))
+        for frm, to in zip(holders, holders[1:]):
+            token.transfer(frm, to, 1)
+        return token
+
+    return _allocated(build)
+
+
+def run_ledgers(holders: int = 200000) -> dict:
+    """Returns the bytes per holder taken by the dict and the indexed ledger"""
+    with Registry():
+        accounts = [Account() for _ in range(holders)]
+
+    return {
+        'dict_per_holder': ledger_bytes(ERC20Token, accounts) / holders,
+        'indexed_per_holder': ledger_bytes(IndexedERC20Token, accounts) / holders,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--accounts', type=int, default=1000000)
+    parser.add_argument('--taps', type=int, default=100000)
+    parser.add_argument('--holders', type=int, default=200000)
+    args = parser.parse_args()
+
+    result = run(args.accounts, args.taps)
+    print(f"{result['objects']} objects")
+    print(f"__slots__: {result['slots_bytes'] / 2 ** 20:.1f} MiB")
+    print(f"__dict__:  {result['dict_bytes'] / 2 ** 20:.1f} MiB")
+    print(f"reduction: {result['reduction']:.0%}")
+
+    ledgers = run_ledgers(args.holders)
+    print(f"dict ledger:    {ledgers['dict_per_holder']:.1f} bytes per holder")
+    print(f"indexed ledger: {ledgers['indexed_per_holder']:.1f} bytes per holder")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+"""Throughput and scaling of the core contract operations
+
+Every benchmark runs for sizes 10, 100, ... up to --max-size and reports the
+seconds, operations per second and the scaling exponent k of seconds ~ size^k
+fitted over the sizes, so that an O(n^2) path shows up as k close to 2.
+Results are written as JSON. Run from the repository root:
+python -m benchmarks.suite --output results.json
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+from helpers import generate_random_payments, process_ingress_payments, convert_to_df
+from models.account import Account
+from models.clock import SimulatedClock
+from models.dao import Bucket, Governance, Tap
+from models.registry import Registry
+from models.tokens import ERC20Token, TingesToken
+
+BENCHMARKS = {}
+
+# Timings shorter than this are too noisy to fit the scaling exponent
+MIN_FIT_SECONDS = 1e-3
+
+
+def benchmark(name: str, max_size: int = None):
+    """Registers a benchmark
+
+    The decorated function takes the size, prepares the model and returns
+    the function to time and the number of operations it performs. Sizes
+    above max_size are skipped even if --max-size allows them.
+    """
+    def decorator(func):
+        BENCHMARKS[name] = (func, max_size)
+        return func
+
+    return decorator
+
+
+def _chain(size, token, max_volume=1):
+    buckets = [
+        Bucket(name=f'bkt_{i}', withdraw_begin=datetime(2019, 1, 1), token=token,
+               max_volume=max_volume)
+        for i in range(size)
+    ]
+    for parent, child in zip(buckets, buckets[1:]):
+        parent.set_overflow_bucket(child)
+    return buckets
+
+
+def _governance(size):
+    stakers = [Account() for _ in range(size)]
+    governance = Governance(
+        organization_name='Benchmark', founders=stakers, min_involv_prcnt=50,
+        min_cons_vote_prcnt=80)
+    governance.set_token(TingesToken())
+    governance.mint_to_founders(stakers, [1000] * size)
+    governance.finish_genesis()
+    return governance, stakers
+
+
+@benchmark('token_mint')
+def token_mint(size):
+    token = ERC20Token()
+    holders = [Account() for _ in range(size)]
+
+    def run():
+        for holder in holders:
+            token.mint(holder, 100)
+
+    return run, size
+
+
+@benchmark('token_transfer')
+def token_transfer(size):
+    token = ERC20Token()
+    holders = [Account() for _ in range(size)]
+    token.mint_many(holders, [100] * size)
+    receivers = holders[1:] + holders[:1]
+
+    def run():
+        for frm, to in zip(holders, receivers):
+            token.transfer(frm, to, 10)
+
+    return run, size
+
+
+@benchmark('bucket_flush')
+def bucket_flush(size):
+    token = ERC20Token()
+    buckets = _chain(size, token)
+    token.mint(buckets[0], size)
+
+    def run():
+        buckets[0].flush()
+
+    return run, size
+
+
+@benchmark('tap_withdraw')
+def tap_withdraw(size):
+    token = ERC20Token()
+    clock = SimulatedClock(datetime(2019, 1, 1))
+    bucket = Bucket(name='bkt', withdraw_begin=datetime(2019, 1, 1), token=token, clock=clock)
+    token.mint(bucket, size * 1000)
+    taps = [Tap(withdrawer=Account(), bucket=bucket, rate=1, clock=clock) for _ in range(size)]
+    for tap in taps:
+        tap.activate()
+    clock.advance(1000)
+
+    def run():
+        for tap in taps:
+            tap.withdraw(1000)
+
+    return run, size
+
+
+@benchmark('poll_vote_finish')
+def poll_vote_finish(size):
+    governance, stakers = _governance(size)
+    proposal = governance.create_proposal(description='Benchmark', exec_data='pass')
+
+    def run():
+        for staker in stakers:
+            proposal.poll.vote_for(staker)
+        governance.finish_proposal_poll(proposal)
+
+    return run, size
+
+
+@benchmark('poll_vote_many_finish')
+def poll_vote_many_finish(size):
+    governance, stakers = _governance(size)
+    proposal = governance.create_proposal(description='Benchmark', exec_data='pass')
+
+    def run():
+        proposal.poll.vote_many(stakers, in_favor=True)
+        governance.finish_proposal_poll(proposal)
+
+    return run, size
+
+
+# a million payments take seconds per run and add nothing to the fitted scaling
+@benchmark('ingress_pipeline', max_size=100000)
+def ingress_pipeline(size):
+    token = ERC20Token()
+    buckets = _chain(4, token, max_volume=size * 1000)
+    # amounts average 5050, the last one is cut to the value
+    value = size * 5050
+
+    def run():
+        payments = generate_random_payments(value=value)
+        convert_to_df(process_ingress_payments(payments, token, *buckets))
+
+    return run, size
+
+
+def _measure(func, size, repeat):
+    seconds = []
+    for _ in range(repeat):
+        run, ops = func(size)
+        start = time.perf_counter()
+        run()
+        seconds.append(time.perf_counter() - start)
+    return min(seconds), ops
+
+
+def _scaling(results):
+    fitted = [r for r in results if r['seconds'] >= MIN_FIT_SECONDS]
+    if len(fitted) < 2:
+        return None
+
+    slope, _ = np.polyfit(
+        np.log([r['size'] for r in fitted]), np.log([r['seconds'] for r in fitted]), 1)
+    return round(float(slope), 3)
+
+
+def run(names=None, max_size=1000000, repeat=3, progress=None) -> dict:
+    """Runs the benchmarks, returns the JSON serializable results
+
+    Sizes up to 10000 are timed repeat times keeping the best, larger ones once.
+    """
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'benchmarks': {},
+    }
+
+    for name in names or BENCHMARKS:
+        func, limit = BENCHMARKS[name]
+        results = []
+        size = 10
+        while size <= min(max_size, limit or max_size):
+            # a registry per run keeps the accounts of finished runs collectable
+            with Registry():
+                seconds, ops = _measure(func, size, repeat if size <= 10000 else 1)
+            results.append({
+                'size': size,
+                'ops': ops,
+                'seconds': seconds,
+                'ops_per_second': ops / seconds if seconds else None,
+            })
+            if progress is not None:
+                progress(name, results[-1])
+            size *= 10
+
+        report['benchmarks'][name] = {'results': results, 'scaling': _scaling(results)}
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('names', nargs='*', help=f'benchmarks to run: {", ".join(BENCHMARKS)}')
+    parser.add_argument('--max-size', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='JSON file, stdout by default')
+    args = parser.parse_args()
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f'unknown benchmarks {", ".join(sorted(unknown))}')
+
+    def progress(name, result):
+        print(f"{name:24} {result['size']:>9} {result['ops_per_second'] or 0:>14.0f} ops/s",
+              file=sys.stderr)
+
+    report = run(args.names, args.max_size, args.repeat, progress)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+
+if __name__ == '__main__':
+    main()
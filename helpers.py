@@ -1,7 +1,12 @@
 from datetime import datetime
-from random import randint
+from itertools import islice
+from random import Random, getrandbits, randint
+import numpy as np
 import pandas as pd
 
+INT64_MAX = np.iinfo(np.int64).max
+PAYMENT_DISTRIBUTIONS = ('uniform', 'lognormal', 'whale')
+
 
 def generate_random_payments(date_range=(datetime(2019, 1, 1), datetime(2020, 1, 1)),
                              amount_range=(100, 10000),
@@ -9,7 +14,7 @@ def generate_random_payments(date_range=(datetime(2019, 1, 1), datetime(2020, 1,
     payments = []
     sum_of_payments = 0
     while sum_of_payments < value:
-        random_date = randint(date_range[0].timestamp(), date_range[1].timestamp())
+        random_date = randint(int(date_range[0].timestamp()), int(date_range[1].timestamp()))
         amount = randint(amount_range[0], amount_range[1])
         if amount + sum_of_payments > value:
             amount = value - sum_of_payments
@@ -20,6 +25,92 @@ def generate_random_payments(date_range=(datetime(2019, 1, 1), datetime(2020, 1,
     return column_names, payments
 
 
+def _capped_amounts(rng, amount_range, value):
+    sum_of_payments = 0
+    while sum_of_payments < value:
+        amount = rng.randint(amount_range[0], amount_range[1])
+        if amount + sum_of_payments > value:
+            amount = value - sum_of_payments
+        sum_of_payments += amount
+        yield amount
+
+
+def iter_random_payments(date_range=(datetime(2019, 1, 1), datetime(2020, 1, 1)),
+                         amount_range=(100, 10000),
+                         value=1000000,
+                         seed=None):
+    """Yields the payments of generate_random_payments in time order
+
+    Nothing is accumulated: the amounts are drawn twice from the same seed
+    (the first pass only counts them) and the dates are generated directly in
+    ascending order as order statistics of uniform samples.
+    """
+    if seed is None:
+        seed = getrandbits(64)
+    count = sum(1 for _ in _capped_amounts(Random(seed), amount_range, value))
+
+    amounts = _capped_amounts(Random(seed), amount_range, value)
+    dates = Random(f'{seed}-dates')
+    start = int(date_range[0].timestamp())
+    span = int(date_range[1].timestamp()) - start + 1
+    position = 0.0
+    for remaining in range(count, 0, -1):
+        # minimum of the remaining uniform samples over [position, 1)
+        position += (1 - position) * (1 - dates.random() ** (1 / remaining))
+        yield [datetime.fromtimestamp(start + int(position * span)), next(amounts)]
+
+
+def _draw_amounts(rng, distribution, amount_range, size):
+    low, high = amount_range
+    if distribution == 'uniform':
+        return rng.integers(low, high, size, endpoint=True)
+    if distribution == 'lognormal':
+        # median in the geometric middle of the range, ~95% of draws inside it
+        amounts = rng.lognormal(np.log(low * high) / 2, np.log(high / low) / 4, size)
+    elif distribution == 'whale':
+        # Pareto tail: most payments are close to the minimum, few reach the maximum
+        amounts = low * (1 + rng.pareto(1.16, size))
+    else:
+        raise ValueError(f'Unknown distribution {distribution}, use one of {PAYMENT_DISTRIBUTIONS}')
+    return np.clip(np.rint(amounts), low, high).astype(np.int64)
+
+
+def generate_payments_array(date_range=(datetime(2019, 1, 1), datetime(2020, 1, 1)),
+                            amount_range=(100, 10000),
+                            value=1000000,
+                            seed=None,
+                            distribution='uniform'):
+    """NumPy counterpart of generate_random_payments
+
+    seed is anything numpy.random.default_rng accepts, including a Generator.
+    Returns sorted datetime64[s] dates and int64 amounts, the last amount is
+    cut so that the amounts sum up to value exactly.
+    """
+    rng = np.random.default_rng(seed)
+
+    drawn = []
+    total = 0
+    size = max(value * 2 // (amount_range[0] + amount_range[1]), 1)
+    while total < value:
+        amounts = _draw_amounts(rng, distribution, amount_range, size)
+        drawn.append(amounts)
+        total += int(amounts.sum())
+        size = max((value - total) // max(int(amounts.mean()), 1) * 11 // 10, 16)
+
+    amounts = np.concatenate(drawn) if drawn else np.empty(0, dtype=np.int64)
+    inflow = np.cumsum(amounts)
+    count = int(np.searchsorted(inflow, value)) + 1 if value > 0 else 0
+    amounts = amounts[:count]
+    if count:
+        amounts[-1] -= inflow[count - 1] - value
+
+    span = int((date_range[1] - date_range[0]).total_seconds())
+    offsets = rng.integers(0, span, count, endpoint=True)
+    offsets.sort()
+    dates = np.datetime64(date_range[0], 's') + offsets.astype('timedelta64[s]')
+    return dates, amounts
+
+
 def process_ingress_payments(payments_set, token, entry_bucket, *args):
     column_names = payments_set[0]
     values = payments_set[1]
@@ -33,7 +124,320 @@ def process_ingress_payments(payments_set, token, entry_bucket, *args):
     return column_names, values
 
 
+def cascade_fill_levels(amounts, capacities, initial=None):
+    """Computes balances of an overflow chain after every payment
+
+    capacities are max_volume values of the chain in overflow order, initial
+    are the balances the buckets hold before the first payment. The last
+    bucket of the chain keeps everything that reaches it. A bucket holding
+    more than its capacity keeps it until overflow first reaches it, then
+    releases its excess down the chain as Bucket.flush does. Returns int64
+    array with a row per payment and a column per bucket.
+    """
+    received = np.cumsum(np.asarray(amounts, dtype=np.int64))
+    if initial is None:
+        initial = [0] * len(capacities)
+
+    levels = np.empty((len(received), len(capacities)), dtype=np.int64)
+    for i, (capacity, held) in enumerate(zip(capacities, initial)):
+        if i == len(capacities) - 1:
+            np.add(received, held, out=levels[:, i])
+        elif held > capacity:
+            reached = received > 0
+            levels[:, i] = np.where(reached, capacity, held)
+            received = np.where(reached, received + (held - capacity), 0)
+        else:
+            kept = np.minimum(received, min(capacity - held, INT64_MAX))
+            np.add(kept, held, out=levels[:, i])
+            received = received - kept
+    return levels
+
+
+def cascade_payments(amounts, token, entry_bucket):
+    """Mints amounts to entry_bucket and computes the chain balances after each
+
+    Returns the overflow chain and its cascade_fill_levels table. The token is
+    left in the same state as after minting and flushing payment by payment.
+    """
+    entry_bucket.flush()
+    chain = entry_bucket.overflow_chain()
+    levels = cascade_fill_levels(
+        amounts,
+        [bkt.max_volume for bkt in chain],
+        [token.balance_of(bkt) for bkt in chain])
+
+    token.mint(entry_bucket, int(np.sum(amounts)))
+    entry_bucket.flush()
+    return chain, levels
+
+
+def process_ingress_payments_batch(payments_set, token, entry_bucket, *args):
+    """Vectorized equivalent of process_ingress_payments
+
+    Computes the whole balances table with cascade_fill_levels instead of
+    minting and flushing payment by payment.
+    """
+    column_names = payments_set[0]
+    values = payments_set[1]
+
+    buckets = [entry_bucket] + list(args)
+    amounts = np.fromiter((payment[1] for payment in values), dtype=np.int64, count=len(values))
+    table = balances_table(amounts, token, buckets)
+
+    for payment, row in zip(values, table.tolist()):
+        payment.extend(row)
+    for i in buckets:
+        column_names.append(i.name)
+    return column_names, values
+
+
+def balances_table(amounts, token, buckets):
+    """Pays amounts into buckets[0], returns int64 balances of buckets after each payment"""
+    balances = [token.balance_of(bkt) for bkt in buckets]
+    chain, levels = cascade_payments(amounts, token, buckets[0])
+
+    table = np.empty((len(amounts), len(buckets)), dtype=np.int64)
+    for i, bkt in enumerate(buckets):
+        if bkt in chain:
+            table[:, i] = levels[:, chain.index(bkt)]
+        else:
+            table[:, i] = balances[i]
+    return table
+
+
+PERIOD_FREQS = {'D': 'D', 'W': 'W-SUN', 'M': 'M'}
+
+
+class PeriodRecorder:
+    """Aggregates processed payments on a calendar grid of days, weeks or months
+
+    Income is summed per period and the bucket balances keep their last value
+    in the period. Chunks must come in time order, only one row per period is
+    kept, so the memory used does not depend on the number of payments.
+    Weeks start on Monday.
+    """
+
+    def __init__(self, columns, freq='M'):
+        if freq not in PERIOD_FREQS:
+            raise ValueError(f'Unknown frequency {freq}, use one of {tuple(PERIOD_FREQS)}')
+
+        self.columns = list(columns)
+        self.freq = freq
+        self.periods = []
+        self.income = []
+        self.balances = []
+
+    def _period_starts(self, dates):
+        if self.freq == 'M':
+            return dates.astype('datetime64[M]')
+
+        days = dates.astype('datetime64[D]')
+        if self.freq == 'W':
+            # 1970-01-01 was a Thursday
+            days = days - (days.astype(np.int64) + 3) % 7
+        return days
+
+    def record(self, dates, amounts, balances):
+        """Adds a chunk of payments and the balances after each of them"""
+        if not len(dates):
+            return
+
+        starts = self._period_starts(np.asarray(dates, dtype='datetime64[s]'))
+        if self.periods and starts[0] < self.periods[-1][-1]:
+            raise ValueError('Payments must be recorded in time order')
+
+        first = np.flatnonzero(np.r_[True, starts[1:] != starts[:-1]])
+        last = np.r_[first[1:], len(starts)] - 1
+        periods = starts[first]
+        income = np.add.reduceat(np.asarray(amounts, dtype=np.int64), first)
+        balances = np.asarray(balances, dtype=np.int64)[last]
+
+        if self.periods and periods[0] == self.periods[-1][-1]:
+            self.income[-1][-1] += income[0]
+            self.balances[-1][-1] = balances[0]
+            periods, income, balances = periods[1:], income[1:], balances[1:]
+            if not len(periods):
+                return
+
+        self.periods.append(periods)
+        self.income.append(income)
+        self.balances.append(balances)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Returns a period indexed frame of income and balances
+
+        Periods without payments are included with zero income and the
+        balances of the previous period.
+        """
+        freq = PERIOD_FREQS[self.freq]
+        if not self.periods:
+            return pd.DataFrame(
+                columns=['income'] + self.columns, dtype=np.int64,
+                index=pd.PeriodIndex([], freq=freq, name='period'))
+
+        periods = np.concatenate(self.periods)
+        positions = (periods - periods[0]).astype(np.int64)
+        if self.freq == 'W':
+            positions //= 7
+        size = int(positions[-1]) + 1
+
+        income = np.zeros(size, dtype=np.int64)
+        income[positions] = np.concatenate(self.income)
+        recorded = np.zeros(size, dtype=np.int64)
+        recorded[positions] = np.arange(len(positions))
+        balances = np.concatenate(self.balances)[np.maximum.accumulate(recorded)]
+
+        index = pd.period_range(start=pd.Timestamp(periods[0]), periods=size, freq=freq, name='period')
+        df = pd.DataFrame(balances, index=index, columns=self.columns)
+        df.insert(0, 'income', income)
+        return df
+
+
+def _payment_chunks(payments, chunk_size):
+    if isinstance(payments, tuple) and isinstance(payments[0], np.ndarray):
+        dates, amounts = payments
+        for i in range(0, len(dates), chunk_size):
+            yield dates[i:i + chunk_size], amounts[i:i + chunk_size]
+        return
+
+    payments = iter(payments)
+    while True:
+        values = list(islice(payments, chunk_size))
+        if not values:
+            return
+        yield np.array([p[0] for p in values], dtype='datetime64[s]'), \
+            np.fromiter((p[1] for p in values), dtype=np.int64, count=len(values))
+
+
+def record_ingress_periods(payments, token, entry_bucket, *args, freq='M', chunk_size=100000):
+    """Pushes time ordered payments through the bucket chain recording them per period
+
+    payments are (dates, amounts) arrays as returned by generate_payments_array
+    or an iterable of [date, amount] rows. Returns the PeriodRecorder frame,
+    no per-payment table is built beyond chunk_size rows.
+    """
+    buckets = [entry_bucket] + list(args)
+    recorder = PeriodRecorder([bkt.name for bkt in buckets], freq=freq)
+
+    for dates, amounts in _payment_chunks(payments, chunk_size):
+        recorder.record(dates, amounts, balances_table(amounts, token, buckets))
+    return recorder.to_frame()
+
+
+class IngressResult:
+    """Columnar result of ingress processing
+
+    dates are datetime64[ns], the only resolution pandas < 2 indexes without a
+    copy, income and the balance of every bucket are int64 columns of one
+    preallocated array. to_df wraps the columns without copying.
+    """
+
+    def __init__(self, names, capacity=0):
+        self.names = list(names)
+        self.size = 0
+        self.dates = np.empty(capacity, dtype='datetime64[ns]')
+        self.income = np.empty(capacity, dtype=np.int64)
+        # Fortran order keeps every bucket column contiguous
+        self.balances = np.empty((capacity, len(self.names)), dtype=np.int64, order='F')
+
+    def _reserve(self, size):
+        if size <= len(self.dates):
+            return
+
+        capacity = max(size, 2 * len(self.dates))
+        for name in ('dates', 'income', 'balances'):
+            column = getattr(self, name)
+            grown = np.empty((capacity,) + column.shape[1:], dtype=column.dtype, order='F')
+            grown[:self.size] = column[:self.size]
+            setattr(self, name, grown)
+
+    def append(self, dates, income, balances):
+        """Appends a chunk of payments and the balances after each of them"""
+        end = self.size + len(dates)
+        self._reserve(end)
+        self.dates[self.size:end] = dates
+        self.income[self.size:end] = income
+        self.balances[self.size:end] = balances
+        self.size = end
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def column_names(self):
+        return ['date', 'income'] + self.names
+
+    def column(self, name: str) -> np.ndarray:
+        """Returns a view of the named column"""
+        if name == 'date':
+            return self.dates[:self.size]
+        if name == 'income':
+            return self.income[:self.size]
+        return self.balances[:self.size, self.names.index(name)]
+
+    def to_df(self) -> pd.DataFrame:
+        """Returns the date indexed DataFrame convert_to_df builds, sharing the columns"""
+        columns = {name: self.column(name) for name in self.column_names[1:]}
+        index = pd.DatetimeIndex(self.column('date'), copy=False, name='date')
+        return pd.DataFrame(columns, index=index, copy=False)
+
+    def to_parquet(self, path, **kwargs):
+        """Writes the result to a Parquet file, needs pyarrow or fastparquet"""
+        self.to_df().to_parquet(path, **kwargs)
+
+    def to_feather(self, path, **kwargs):
+        """Writes the result to a Feather file, needs pyarrow"""
+        self.to_df().reset_index().to_feather(path, **kwargs)
+
+
+def process_ingress_columns(payments, token, entry_bucket, *args, chunk_size=100000):
+    """Columnar process_ingress_payments
+
+    payments are (dates, amounts) arrays or an iterable of [date, amount]
+    rows, the rows are not modified. Returns an IngressResult.
+    """
+    buckets = [entry_bucket] + list(args)
+    if isinstance(payments, tuple) and isinstance(payments[0], np.ndarray):
+        capacity = len(payments[0])
+    else:
+        capacity = len(payments) if hasattr(payments, '__len__') else chunk_size
+    result = IngressResult([bkt.name for bkt in buckets], capacity)
+
+    for dates, amounts in _payment_chunks(payments, chunk_size):
+        result.append(dates, amounts, balances_table(amounts, token, buckets))
+    return result
+
+
+def iter_ingress_chunks(payments, token, entry_bucket, *args, chunk_size=10000):
+    """Pushes an iterable of payments through the bucket chain chunk by chunk
+
+    Yields a DataFrame of at most chunk_size rows per chunk, so the memory used
+    does not depend on the number of payments.
+    """
+    payments = iter(payments)
+    while True:
+        values = list(islice(payments, chunk_size))
+        if not values:
+            return
+        chunk = process_ingress_payments_batch(
+            (['date', 'income'], values), token, entry_bucket, *args)
+        yield convert_to_df(chunk)
+
+
+def write_chunks_csv(chunks, path):
+    """Writes DataFrame chunks to a single CSV file, returns written rows count"""
+    rows = 0
+    with open(path, 'w', newline='') as f:
+        for df in chunks:
+            df.to_csv(f, header=rows == 0)
+            rows += len(df)
+    return rows
+
+
 def convert_to_df(payments_set):
+    if isinstance(payments_set, IngressResult):
+        return payments_set.to_df()
+
     df = pd.DataFrame(payments_set[1], columns=payments_set[0])
     df = df.set_index('date')
     return df
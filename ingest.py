@@ -0,0 +1,130 @@
+"""Chunked replay of recorded payment histories through the bucket chain"""
+import os
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from helpers import balances_table
+
+FILE_FORMATS = ('csv', 'parquet')
+
+
+class PaymentFileError(Exception):
+    pass
+
+
+@dataclass
+class IngestStats:
+    """Progress of an ingest, passed to the progress callback after every chunk"""
+    rows: int = 0
+    chunks: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def _file_format(path) -> str:
+    name = os.fspath(path).lower()
+    for suffix in ('.gz', '.bz2', '.zip', '.xz'):
+        name = name[:-len(suffix)] if name.endswith(suffix) else name
+
+    if name.endswith(('.parquet', '.pq')):
+        return 'parquet'
+    if name.endswith(('.csv', '.txt')):
+        return 'csv'
+    raise PaymentFileError(f'Unknown format of {path}, pass one of {FILE_FORMATS}')
+
+
+def _read_chunks(path, file_format, columns, chunk_size):
+    if file_format == 'csv':
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunk_size)
+    elif file_format == 'parquet':
+        import pyarrow.parquet as pq  # pylint: disable=import-outside-toplevel
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas(ignore_metadata=True)
+    else:
+        raise PaymentFileError(f'Unknown format {file_format}, use one of {FILE_FORMATS}')
+
+
+def _validate(chunk, date_column, amount_column, offset, previous):
+    """Returns datetime64[s] dates and int64 amounts of the chunk"""
+    def fail(message):
+        raise PaymentFileError(f'Rows {offset}-{offset + len(chunk) - 1}: {message}')
+
+    if chunk[[date_column, amount_column]].isna().any().any():
+        fail('missing values')
+
+    try:
+        dates = pd.to_datetime(chunk[date_column])
+    except (ValueError, TypeError) as e:
+        fail(f'invalid {date_column}: {e}')
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_convert('UTC').dt.tz_localize(None)
+    dates = dates.to_numpy(dtype='datetime64[s]')
+
+    amounts = chunk[amount_column].to_numpy()
+    if amounts.dtype.kind == 'f' and np.array_equal(amounts, np.round(amounts)):
+        amounts = amounts.astype(np.int64)
+    if amounts.dtype.kind not in 'iu':
+        fail(f'{amount_column} must be integers, got {amounts.dtype}')
+    amounts = amounts.astype(np.int64, copy=False)
+    if (amounts < 0).any():
+        fail(f'negative {amount_column}')
+
+    if (dates[1:] < dates[:-1]).any() or (previous is not None and dates[0] < previous):
+        fail(f'{date_column} is not in time order')
+
+    return dates, amounts
+
+
+def iter_payment_file(path, date_column='date', amount_column='income', chunk_size=100000,
+                      file_format=None):
+    """Yields validated (dates, amounts) chunks of a CSV or Parquet payments file
+
+    CSV files are read with a chunked reader, Parquet files batch by batch,
+    so at most chunk_size rows are in memory. Raises PaymentFileError on
+    missing values, non-integer or negative amounts and payments out of time order.
+    """
+    file_format = file_format or _file_format(path)
+    offset = 0
+    previous = None
+
+    for chunk in _read_chunks(path, file_format, [date_column, amount_column], chunk_size):
+        if not len(chunk):
+            continue
+
+        dates, amounts = _validate(chunk, date_column, amount_column, offset, previous)
+        offset += len(chunk)
+        previous = dates[-1]
+        yield dates, amounts
+
+
+def ingest_payments(path, token, entry_bucket, *args, sink=None, progress=None, **kwargs):
+    """Replays a payments file through the bucket chain chunk by chunk
+
+    sink(dates, amounts, balances) receives every chunk with the balances of
+    entry_bucket and args after each payment, e.g. PeriodRecorder.record or
+    IngressResult.append. progress(stats) is called after every chunk. The
+    rest of kwargs go to iter_payment_file. Returns the IngestStats.
+    """
+    buckets = [entry_bucket] + list(args)
+    stats = IngestStats()
+    start = time.perf_counter()
+
+    for dates, amounts in iter_payment_file(path, **kwargs):
+        balances = balances_table(amounts, token, buckets)
+        if sink is not None:
+            sink(dates, amounts, balances)
+
+        stats.rows += len(amounts)
+        stats.chunks += 1
+        stats.seconds = time.perf_counter() - start
+        if progress is not None:
+            progress(stats)
+
+    return stats
@@ -1,14 +1,51 @@
 import os
+from itertools import count
+
+from models.registry import INDEX_COUNTER, Registry, current_registry
 
 
 class Account:
     ACCOUNTS_STORAGE = {}
+    INDEX_COUNTER = INDEX_COUNTER
     """Ethereum account"""
+    __slots__ = ('address', 'index', '__weakref__')
+
+    # Whether tokens tracking changes record the account (see ERC20Token.track_changes)
+    changes_tracked = False
+
     def __init__(self):
-        self.address = "0x" + os.urandom(20).hex()
-        self.ACCOUNTS_STORAGE[self.address] = self
+        active_registry().add(self)
+
+    @staticmethod
+    def lookup(address: str) -> 'Account':
+        """Returns the account with the given address from the active registry"""
+        return active_registry()[address]
 
     def __str__(self):
         return f'Account {self.address}'
 
     __repr__ = __str__
+
+
+class _GlobalRegistry(Registry):
+    """Registry used when none is active: random addresses kept in Account.ACCOUNTS_STORAGE"""
+
+    def __init__(self):  # pylint: disable=super-init-not-called
+        self.counter = count()
+        self._tokens = []
+
+    @property
+    def accounts(self):
+        return Account.ACCOUNTS_STORAGE
+
+    def address(self, number: int) -> str:
+        return "0x" + os.urandom(20).hex()
+
+
+GLOBAL_REGISTRY = _GlobalRegistry()
+
+
+def active_registry() -> Registry:
+    """Returns the registry new accounts go to"""
+    registry = current_registry()
+    return GLOBAL_REGISTRY if registry is None else registry
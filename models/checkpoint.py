@@ -0,0 +1,428 @@
+"""Binary checkpoints of model state
+
+A checkpoint is a directory with graph.json describing the contracts and
+their references (by row in the accounts table) and .npy files holding the
+accounts table, balances, stakes and votes. Arrays are memory-mapped on load;
+indexed token balances are copied from them page by page with numpy, the
+other tables are read into Python objects.
+"""
+import importlib
+import json
+from array import array
+import os
+from datetime import datetime
+
+import numpy as np
+
+from models.account import Account, active_registry
+from models.clock import SYSTEM_CLOCK, SimulatedClock
+from models.dao import Bucket, Governance, Proposal, ProposalAction, Tap
+from models.ledger import IndexedBalances
+from models.poll import Poll
+from models.registry import Registry
+from models.stakes import StakeHistory
+from models.tokens import ERC20Token
+
+FORMAT_VERSION = 1
+GRAPH_FILE = 'graph.json'
+ADDRESS_SIZE = 20
+CONTRACTS = (Governance, ERC20Token, Bucket, Tap, Poll)
+
+
+class UnsupportedCheckpoint(Exception):
+    pass
+
+
+def _class_path(cls) -> str:
+    return f'{cls.__module__}:{cls.__qualname__}'
+
+
+def _resolve_class(path: str):
+    module, name = path.split(':')
+    return getattr(importlib.import_module(module), name)
+
+
+def _date(value: datetime):
+    return value.isoformat() if value is not None else None
+
+
+def _parse_date(value: str):
+    return datetime.fromisoformat(value) if value is not None else None
+
+
+def _json_native(value) -> bool:
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return True
+    if isinstance(value, (list, tuple)):
+        return all(_json_native(v) for v in value)
+    if isinstance(value, dict):
+        return all(isinstance(k, str) and _json_native(v) for k, v in value.items())
+    return False
+
+
+def _raw_addresses(addresses) -> np.ndarray:
+    raw = b''.join(bytes.fromhex(address[2:]) for address in addresses)
+    return np.frombuffer(raw, dtype=np.uint8).reshape(-1, ADDRESS_SIZE)
+
+
+def _hex_addresses(raw: np.ndarray):
+    data = raw.tobytes()
+    return ['0x' + data[i:i + ADDRESS_SIZE].hex() for i in range(0, len(data), ADDRESS_SIZE)]
+
+
+class _Writer:
+    def __init__(self, path: str):
+        self.path = path
+        self.rows = {}
+        self.accounts = []
+        self.objects = {}
+        self.clocks = []
+        self.clock_ids = {}
+        self.arrays = 0
+
+    def ref(self, account) -> int:
+        if account is None:
+            return -1
+
+        row = self.rows.get(id(account))
+        if row is None:
+            row = self.rows[id(account)] = len(self.accounts)
+            self.accounts.append(account)
+        return row
+
+    def refs(self, accounts) -> str:
+        return self.array(np.array([self.ref(a) for a in accounts], dtype=np.int64))
+
+    def clock(self, clock) -> int:
+        if clock is SYSTEM_CLOCK:
+            return -1
+
+        if id(clock) not in self.clock_ids:
+            self.clock_ids[id(clock)] = len(self.clocks)
+            self.clocks.append({'start': _date(clock.start), 'seconds': clock.seconds})
+        return self.clock_ids[id(clock)]
+
+    def array(self, values) -> str:
+        values = np.asarray(values)
+        if values.dtype == object:
+            raise UnsupportedCheckpoint('Only int64 and float64 amounts can be stored')
+
+        name = f'{self.arrays}.npy'
+        np.save(os.path.join(self.path, name), values)
+        self.arrays += 1
+        return name
+
+    def value(self, value):
+        if isinstance(value, Account):
+            return {'ref': self.ref(value)}
+        if isinstance(value, datetime):
+            return {'datetime': value.isoformat()}
+        if isinstance(value, np.generic):
+            return self.value(value.item())
+        if not _json_native(value):
+            raise UnsupportedCheckpoint(f'Action argument {value!r} can\'t be stored')
+        return {'value': value}
+
+    def exec_data(self, exec_data):
+        if isinstance(exec_data, str):
+            return exec_data
+
+        actions = [exec_data] if isinstance(exec_data, ProposalAction) else exec_data
+        return {
+            'single': isinstance(exec_data, ProposalAction),
+            'actions': [{
+                'target': self.ref(a.target),
+                'method': a.method,
+                'args': [self.value(v) for v in a.args],
+                'kwargs': {key: self.value(v) for key, v in a.kwargs.items()},
+            } for a in actions],
+        }
+
+    def stake_history(self, history: StakeHistory):
+        changes = list(history.accounts.values())
+        return {
+            'snapshot_id': history.snapshot_id,
+            'accounts': self.refs(history.accounts.keys()),
+            'lengths': self.array(np.array([len(ids) for ids, _ in changes], dtype=np.int64)),
+            'ids': self.array(np.array([i for ids, _ in changes for i in ids], dtype=np.int64)),
+            'stakes': self.array(np.array([s for _, stakes in changes for s in stakes], dtype=np.int64)),
+            'total_ids': self.array(np.array(history.total_ids, dtype=np.int64)),
+            'totals': self.array(np.array(history.totals, dtype=np.int64).reshape(-1, 2)),
+        }
+
+    def describe(self, obj):
+        if isinstance(obj, Governance):
+            return {
+                'organization_name': obj.organization_name,
+                'founders': [self.ref(f) for f in obj.founders],
+                'stakers': self.refs(obj.staked_tokens.keys()),
+                'stakes': self.array(list(obj.staked_tokens.values())),
+                'stake_history': self.stake_history(obj.stake_history),
+                'token': self.ref(obj.token),
+                'proposals': [{
+                    'description': p.description,
+                    'exec_data': self.exec_data(p.exec_data),
+                    'poll': self.ref(p.poll),
+                    'accepted': p.accepted,
+                    'finished': p.finished,
+                    'executed': p.executed,
+                    'snapshot': p.snapshot,
+                } for p in obj.proposals],
+                'min_involv_prcnt': obj.min_involv_prcnt,
+                'min_cons_vote_prcnt': obj.min_cons_vote_prcnt,
+                'buckets': [self.ref(b) for b in obj.buckets],
+                'taps': [[key, self.ref(tap)] for key, tap in obj.taps.items()],
+                'current_state': obj.current_state,
+            }
+        if isinstance(obj, ERC20Token):
+            if isinstance(obj.balances, IndexedBalances):
+                holders, amounts = obj.balances.holdings()
+                return {
+                    'total_supply': obj.total_supply,
+                    'holders': self.refs(holders),
+                    'amounts': self.array(amounts),
+                }
+            return {
+                'total_supply': obj.total_supply,
+                'addresses': self.array(_raw_addresses(obj.balances.keys())),
+                'amounts': self.array(list(obj.balances.values())),
+            }
+        if isinstance(obj, Bucket):
+            return {
+                'name': obj.name,
+                'withdraw_begin': _date(obj.withdraw_begin),
+                'token': self.ref(obj.token),
+                'max_volume': obj.max_volume,
+                'overflow_bkt': self.ref(obj.overflow_bkt),
+                'withdrawn': obj.withdrawn,
+                'clock': self.clock(obj.clock),
+            }
+        if isinstance(obj, Tap):
+            return {
+                'withdrawer': self.ref(obj.withdrawer),
+                'bucket': self.ref(obj.bucket),
+                'description': obj.description,
+                'rate': obj.rate,
+                'last_withdraw': _date(obj.last_withdraw),
+                'excess_amount': obj.excess_amount,
+                'active': obj.active,
+                'clock': self.clock(obj.clock),
+            }
+        return {
+            'governance': self.ref(obj.governance),
+            'snapshot': obj.snapshot,
+            'votes_for': self.refs(obj.votes_for),
+            'votes_against': self.refs(obj.votes_against),
+            'tokens_for': obj.tokens_for,
+            'tokens_against': obj.tokens_against,
+        }
+
+    def write(self, roots):
+        os.makedirs(self.path, exist_ok=True)
+        graph_path = os.path.join(self.path, GRAPH_FILE)
+        # the arrays of an older checkpoint in path are overwritten below
+        if os.path.exists(graph_path):
+            os.remove(graph_path)
+        root_rows = [self.ref(r) for r in roots]
+
+        # describing a contract references its neighbours, which extends the table
+        kinds = {}
+        row = 0
+        while row < len(self.accounts):
+            account = self.accounts[row]
+            if type(account) not in kinds:
+                kinds[type(account)] = len(kinds)
+            if isinstance(account, CONTRACTS):
+                self.objects[str(row)] = self.describe(account)
+            row += 1
+
+        graph = {
+            'version': FORMAT_VERSION,
+            'roots': root_rows,
+            'classes': [_class_path(cls) for cls in kinds],
+            'addresses': self.array(_raw_addresses(a.address for a in self.accounts)),
+            'kinds': self.array(np.fromiter(
+                (kinds[type(a)] for a in self.accounts), dtype=np.int16, count=len(self.accounts))),
+            'clocks': self.clocks,
+            'objects': self.objects,
+        }
+        # written aside and renamed, so graph.json is there only once the checkpoint is complete
+        with open(graph_path + '.tmp', 'w') as f:
+            json.dump(graph, f)
+        os.replace(graph_path + '.tmp', graph_path)
+
+
+def save_checkpoint(path: str, *roots):
+    """Saves the contracts reachable from roots (Governance, tokens, buckets, taps...) to path"""
+    _Writer(path).write(roots)
+
+
+class _Reader:
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, GRAPH_FILE)) as f:
+            self.graph = json.load(f)
+
+        if self.graph['version'] != FORMAT_VERSION:
+            raise UnsupportedCheckpoint(f'Checkpoint format {self.graph["version"]}')
+
+        self.clocks = [
+            SimulatedClock(_parse_date(c['start']), c['seconds']) for c in self.graph['clocks']
+        ]
+        self.accounts = []
+
+    def array(self, name: str) -> np.ndarray:
+        return np.load(os.path.join(self.path, name), mmap_mode='r')
+
+    def clock(self, clock_id: int):
+        return SYSTEM_CLOCK if clock_id == -1 else self.clocks[clock_id]
+
+    def ref(self, row: int):
+        return self.accounts[row] if row != -1 else None
+
+    def refs(self, name: str):
+        accounts = self.accounts
+        return [accounts[row] for row in self.array(name).tolist()]
+
+    def stake_history(self, fields) -> StakeHistory:
+        history = StakeHistory()
+        history.snapshot_id = fields['snapshot_id']
+        ids = self.array(fields['ids']).tolist()
+        stakes = self.array(fields['stakes']).tolist()
+        start = 0
+        for account, length in zip(self.refs(fields['accounts']),
+                                   self.array(fields['lengths']).tolist()):
+            history.accounts[account] = (
+                array('q', ids[start:start + length]), array('q', stakes[start:start + length]))
+            history.owned.add(account)
+            start += length
+        history.total_ids = self.array(fields['total_ids']).tolist()
+        history.totals = [tuple(t) for t in self.array(fields['totals']).tolist()]
+        return history
+
+    def value(self, value):
+        if 'ref' in value:
+            return self.ref(value['ref'])
+        if 'datetime' in value:
+            return _parse_date(value['datetime'])
+        return value['value']
+
+    def exec_data(self, exec_data):
+        if isinstance(exec_data, str):
+            return exec_data
+
+        actions = [
+            ProposalAction(
+                target=self.ref(a['target']),
+                method=a['method'],
+                args=[self.value(v) for v in a['args']],
+                kwargs={key: self.value(v) for key, v in a['kwargs'].items()})
+            for a in exec_data['actions']
+        ]
+        return actions[0] if exec_data['single'] else actions
+
+    @staticmethod
+    def create(cls):
+        """Creates a blank contract to be filled by restore"""
+        if issubclass(cls, Governance):
+            return cls(organization_name=None, founders=[], min_involv_prcnt=0, min_cons_vote_prcnt=0)
+        if issubclass(cls, Bucket):
+            return cls(name=None, withdraw_begin=None)
+        if issubclass(cls, Tap):
+            return cls(withdrawer=None, bucket=None)
+        if issubclass(cls, Poll):
+            return cls(governance=None)
+        return cls()
+
+    def restore(self, obj, fields):
+        if isinstance(obj, Governance):
+            obj.organization_name = fields['organization_name']
+            obj.founders = [self.ref(r) for r in fields['founders']]
+            obj.staked_tokens = dict(zip(
+                self.refs(fields['stakers']), self.array(fields['stakes']).tolist()))
+            obj.stake_history = self.stake_history(fields['stake_history'])
+            obj.token = self.ref(fields['token'])
+            obj.proposals = [
+                Proposal(
+                    description=p['description'],
+                    exec_data=self.exec_data(p['exec_data']),
+                    poll=self.ref(p['poll']),
+                    accepted=p['accepted'],
+                    finished=p['finished'],
+                    executed=p['executed'],
+                    snapshot=p['snapshot'])
+                for p in fields['proposals']
+            ]
+            obj.min_involv_prcnt = fields['min_involv_prcnt']
+            obj.min_cons_vote_prcnt = fields['min_cons_vote_prcnt']
+            obj.buckets = [self.ref(r) for r in fields['buckets']]
+            obj.taps = {key: self.ref(r) for key, r in fields['taps']}
+            obj.set_state(fields['current_state'])
+        elif isinstance(obj, ERC20Token):
+            amounts = self.array(fields['amounts'])
+            if 'holders' in fields:
+                rows = self.array(fields['holders'])
+                obj.balances.restore(self.indices[rows], self.objects[rows], amounts)
+            else:
+                obj.balances = dict(zip(
+                    _hex_addresses(self.array(fields['addresses'])), amounts.tolist()))
+            obj.total_supply = fields['total_supply']
+        elif isinstance(obj, Bucket):
+            obj.name = fields['name']
+            obj.withdraw_begin = _parse_date(fields['withdraw_begin'])
+            obj.token = self.ref(fields['token'])
+            obj.max_volume = fields['max_volume']
+            obj.overflow_bkt = self.ref(fields['overflow_bkt'])
+            obj.withdrawn = fields['withdrawn']
+            obj.clock = self.clock(fields['clock'])
+        elif isinstance(obj, Tap):
+            obj.withdrawer = self.ref(fields['withdrawer'])
+            obj.bucket = self.ref(fields['bucket'])
+            obj.description = fields['description']
+            obj.rate = fields['rate']
+            obj.last_withdraw = _parse_date(fields['last_withdraw'])
+            obj.excess_amount = fields['excess_amount']
+            obj.active = fields['active']
+            obj.clock = self.clock(fields['clock'])
+        elif isinstance(obj, Poll):
+            obj.governance = self.ref(fields['governance'])
+            obj.snapshot = fields['snapshot']
+            obj.votes_for = self.refs(fields['votes_for'])
+            obj.votes_against = self.refs(fields['votes_against'])
+            obj.voters = set(obj.votes_for + obj.votes_against)
+            obj.tokens_for = fields['tokens_for']
+            obj.tokens_against = fields['tokens_against']
+
+    def read(self):
+        classes = [_resolve_class(path) for path in self.graph['classes']]
+        contracts = [issubclass(cls, CONTRACTS) for cls in classes]
+        registry = active_registry()
+        scratch = Registry()
+        accounts = self.accounts
+
+        addresses = _hex_addresses(self.array(self.graph['addresses']))
+        for address, kind in zip(addresses, self.array(self.graph['kinds']).tolist()):
+            if contracts[kind]:
+                # contracts are constructed aside and then registered under the saved address
+                with scratch:
+                    account = self.create(classes[kind])
+            else:
+                account = classes[kind].__new__(classes[kind])
+            registry.add(account, address)
+            accounts.append(account)
+
+        self.objects = np.empty(len(accounts), dtype=object)
+        self.objects[:] = accounts
+        self.indices = np.fromiter((a.index for a in accounts), dtype=np.int64, count=len(accounts))
+        for row, fields in self.graph['objects'].items():
+            self.restore(self.accounts[int(row)], fields)
+
+        for account in accounts:
+            if isinstance(account, Bucket) and account.overflow_bkt is not None:
+                account.chain_version.link(account.overflow_bkt.chain_version)
+        return [self.ref(row) for row in self.graph['roots']]
+
+
+def load_checkpoint(path: str) -> list:
+    """Restores a checkpoint, returns the restored roots in the order they were saved"""
+    return _Reader(path).read()
@@ -0,0 +1,44 @@
+"""Clocks the time dependent contracts read the current time from"""
+from datetime import datetime, timedelta
+
+EPOCH = datetime(1970, 1, 1)
+
+
+class SystemClock:
+    """Wall clock, the default of every contract"""
+
+    def now(self) -> datetime:  # pylint: disable=no-self-use
+        return datetime.now()
+
+    def timestamp(self) -> int:
+        """Returns seconds from EPOCH to now, both naive as the contracts dates are"""
+        return int((self.now() - EPOCH).total_seconds())
+
+
+class SimulatedClock:
+    """Clock counting integer seconds from start, moved only by the simulation
+
+    Share one instance between the contracts of a model to give them a common
+    time which is independent from other models and threads.
+    """
+
+    def __init__(self, start: datetime, seconds: int = 0):
+        self.start = start
+        self.seconds = seconds
+        self.start_timestamp = int((start - EPOCH).total_seconds())
+
+    def now(self) -> datetime:
+        return self.start + timedelta(seconds=self.seconds)
+
+    def timestamp(self) -> int:
+        """Returns seconds from EPOCH to now"""
+        return self.start_timestamp + self.seconds
+
+    def advance(self, seconds: int):
+        self.seconds += seconds
+
+    def move_to(self, moment: datetime):
+        self.seconds = int((moment - self.start).total_seconds())
+
+
+SYSTEM_CLOCK = SystemClock()
@@ -1,24 +1,37 @@
 """The tokenomics package for token economy modeling"""
 import sys
-from typing import List
+from heapq import heapify, heappop, heappush
+from functools import lru_cache
+from typing import List, Mapping, Optional, Sequence, Union
 from datetime import datetime
-from dataclasses import dataclass
+from types import MappingProxyType
+from dataclasses import dataclass, field
 
 from models.account import Account
+from models.clock import SYSTEM_CLOCK
+from models.journal import OVERFLOW, WITHDRAW, TAP_WITHDRAW, RATE_CHANGE
 from models.tokens import ERC20Token, TingesToken
 from models.poll import Poll
-from models.helpers import StateMixin, check_caller, require_state
+from models.stakes import StakeHistory
+from models.topology import ChainVersion, CompiledChain
+from models.helpers import StateMixin, check_caller, probe, require_state
 
 
 class Bucket(Account, StateMixin):
     """The container of predefined volume storing raised funds"""
 
+    __slots__ = ('name', 'withdraw_begin', 'token', 'max_volume', 'overflow_bkt', 'clock',
+                 'withdrawn', 'journal', 'chain_version', '_chain_cache', 'current_state')
+
+    changes_tracked = True
+
     def __init__(
             self,
             name: str,
             withdraw_begin: datetime,
             token: ERC20Token = None,
             max_volume: int = sys.maxsize,
+            clock=None,
     ):
         super().__init__()
 
@@ -27,29 +40,118 @@ class Bucket(Account, StateMixin):
         self.token = token
         self.max_volume = max_volume
         self.overflow_bkt = None
+        self.clock = clock or SYSTEM_CLOCK
+        self.withdrawn = 0
+        self.journal = None
+        self.chain_version = ChainVersion(self)
+        self._chain_cache = None
 
+    @probe(histogram=True)
     @check_caller('Governance')
-    def flush(self):
-        """Flushes extra tokens to the overflow bucket"""
-        if self.overflow_bkt:
-            token_balance = self.token.balance_of(self)
-
-            if token_balance > self.max_volume:
-                self.token.transfer(self, self.overflow_bkt, token_balance - self.max_volume)
-
-            self.overflow_bkt.flush()
+    def flush(self, changed_only: bool = False) -> int:
+        """Flushes extra tokens down the overflow chain, returns the number of overflows
+
+        Stops at the first bucket without excess. With changed_only also
+        flushes the buckets further down the chain which received tokens since
+        their last flush, as recorded by the token (see ERC20Token.track_changes).
+        """
+        if changed_only:
+            return self._flush_changed()
+
+        depth = 0
+        bkt = self
+        while bkt.overflow_bkt:
+            excess = bkt.token.balance_of(bkt) - bkt.max_volume
+            if excess <= 0:
+                break
+
+            bkt.token.transfer(bkt, bkt.overflow_bkt, excess)
+            if bkt.journal is not None:
+                bkt.journal.record(OVERFLOW, bkt.index, bkt.index, bkt.overflow_bkt.index, excess)
+            bkt = bkt.overflow_bkt
+            depth += 1
+
+        return depth
+
+    def _flush_changed(self):
+        chain, positions = self._chain()
+
+        if self.token.changed is None:
+            # Nothing is known about the past changes, flush the whole chain once
+            self.token.track_changes()
+            pending = list(range(len(chain)))
+        else:
+            pending = [positions[a] for a in self.token.changed if a in positions]
+            heapify(pending)
+
+        changed = self.token.changed
+        overflows = 0
+        while pending:
+            i = heappop(pending)
+            while pending and pending[0] == i:
+                heappop(pending)
+
+            bkt = chain[i]
+            changed.discard(bkt.address)
+            if bkt.overflow_bkt:
+                excess = bkt.token.balance_of(bkt) - bkt.max_volume
+                if excess > 0:
+                    bkt.token.transfer(bkt, bkt.overflow_bkt, excess)
+                    if bkt.journal is not None:
+                        bkt.journal.record(
+                            OVERFLOW, bkt.index, bkt.index, bkt.overflow_bkt.index, excess)
+                    changed.discard(bkt.overflow_bkt.address)
+                    heappush(pending, i + 1)
+                    overflows += 1
+
+        return overflows
+
+    def _chain(self):
+        group = self.chain_version
+        cache = self._chain_cache
+        if cache is None or cache[0] is not group or cache[1] != group.topology:
+            chain = [self]
+            while chain[-1].overflow_bkt:
+                chain.append(chain[-1].overflow_bkt)
+            positions = {bkt.address: i for i, bkt in enumerate(chain)}
+            cache = self._chain_cache = (group, group.topology, chain, positions)
+
+        return cache[2], cache[3]
+
+    def overflow_chain(self) -> List['Bucket']:
+        """Returns this bucket followed by all buckets it overflows into"""
+        return list(self._chain()[0])
+
+    def compile(self) -> CompiledChain:
+        """Compiles the overflow chain starting at this bucket, see CompiledChain"""
+        return CompiledChain(self)
 
     @check_caller('Governance')
     def set_overflow_bucket(self, overflow_bkt: 'Bucket'):
         """Sets overflow bucket"""
+        bkt = overflow_bkt
+        while bkt is not None:
+            if bkt is self:
+                raise OverflowCycleError()
+            bkt = bkt.overflow_bkt
+
         self.overflow_bkt = overflow_bkt
+        self.chain_version.link(overflow_bkt.chain_version if overflow_bkt is not None else None)
 
     # Should check validness of caller
     @check_caller('Tap')
-    def withdraw(self, to: Account, amount: int):
-        """Withdraws tokens"""
-        if self.withdraw_begin <= datetime.now() and self.token.balance_of(self) >= amount:
-            self.token.transfer(self, to, amount)
+    def withdraw(self, to: Account, amount: int) -> bool:
+        """Withdraws tokens, returns whether they were transferred"""
+        if self.withdraw_begin > self.clock.now() or self.token.balance_of(self) < amount:
+            return False
+
+        self.token.transfer(self, to, amount)
+        self.withdrawn += amount
+        self.chain_version.withdrawals += 1
+
+        if self.journal is not None:
+            self.journal.record(WITHDRAW, self.index, self.index, to.index, amount)
+        return True
 
     def __str__(self):
         return f'Bucket {self.name} ({self.address})'
@@ -60,12 +162,16 @@ class Bucket(Account, StateMixin):
 class Tap(Account):
     """Withdraw limiter"""
 
+    __slots__ = ('withdrawer', 'bucket', 'description', 'rate', 'clock', 'journal',
+                 'last_withdraw', 'excess_amount', 'active')
+
     def __init__(
             self,
             withdrawer: Account,
             bucket: Bucket,
             description: str = None,
             rate: int = 0,
+            clock=None,
     ):
         super().__init__()
 
@@ -73,6 +179,8 @@ class Tap(Account):
         self.bucket = bucket
         self.description = description
         self.rate = rate
+        self.clock = clock or SYSTEM_CLOCK
+        self.journal = None
 
         self.last_withdraw = None
         self.excess_amount = None
@@ -83,7 +191,7 @@ class Tap(Account):
         if last_withdraw:
             self.last_withdraw = last_withdraw
         else:
-            self.last_withdraw = datetime.now()
+            self.last_withdraw = self.clock.now()
 
         self.excess_amount = 0
         self.active = True
@@ -96,9 +204,12 @@ class Tap(Account):
     def set_rate(self, new_rate: int):
         self.rate = new_rate
 
+        if self.journal is not None:
+            self.journal.record(RATE_CHANGE, self.index, -1, -1, new_rate)
+
     @property
     def available_by_rate(self):
-        sec_from_last_wd = int((datetime.now() - self.last_withdraw).total_seconds())
+        sec_from_last_wd = int((self.clock.now() - self.last_withdraw).total_seconds())
 
         return sec_from_last_wd * self.rate
 
@@ -106,6 +217,7 @@ class Tap(Account):
     def total_available(self):
         return self.available_by_rate + self.excess_amount
 
+    @probe()
     @check_caller('withdrawer')
     def withdraw(self, amount: int):
         if self.active and amount <= self.total_available:
@@ -116,9 +228,13 @@ class Tap(Account):
             else:
                 self.excess_amount -= diff
 
-            self.last_withdraw = datetime.now()
+            self.last_withdraw = self.clock.now()
+
+            transferred = self.bucket.withdraw(self.withdrawer, amount)
 
-            self.bucket.withdraw(self.withdrawer, amount)
+            if transferred and self.journal is not None:
+                self.journal.record(
+                    TAP_WITHDRAW, self.index, self.bucket.index, self.withdrawer.index, amount)
 
     @check_caller('withdrawer')
     def withdraw_all(self):
@@ -130,6 +246,10 @@ class Tap(Account):
     __repr__ = __str__
 
 
+class OverflowCycleError(Exception):
+    pass
+
+
 class AccountNotFounder(Exception):
     pass
 
@@ -150,15 +270,58 @@ class CantExecutreProposal(Exception):
     pass
 
 
+class InvalidProposalAction(Exception):
+    pass
+
+
+@dataclass
+class ProposalAction:
+    """Call of a Governance-only method of target, resolved when created"""
+    target: Account
+    method: str
+    args: tuple = ()
+    kwargs: dict = field(default_factory=dict)
+
+    def __post_init__(self):
+        func = getattr(type(self.target), self.method, None)
+        if getattr(func, 'caller_name', None) != 'Governance':
+            raise InvalidProposalAction(f'{self.method} of {self.target} is not a Governance method')
+
+        self.args = tuple(self.args)
+        self._call = getattr(self.target, self.method)
+
+    def __call__(self):
+        return self._call(*self.args, **self.kwargs)
+
+
+@lru_cache(maxsize=None)
+def compile_exec_data(exec_data: str):
+    """Compiles string exec_data once per distinct source"""
+    return compile(exec_data, '<proposal>', 'exec')
+
+
+def _check_exec_data(exec_data):
+    if isinstance(exec_data, str):
+        compile_exec_data(exec_data)
+    elif not isinstance(exec_data, ProposalAction) and \
+            not all(isinstance(a, ProposalAction) for a in exec_data):
+        raise InvalidProposalAction('exec_data must be a string or ProposalAction(s)')
+
+
 @dataclass
 class Proposal:
-    """Proposal struct for Governance contract"""
+    """Proposal struct for Governance contract
+
+    exec_data is a ProposalAction, a list of them or Python source run with
+    the Governance as self.
+    """
     description: str
-    exec_data: str
+    exec_data: Union[str, ProposalAction, List[ProposalAction]]
     poll: Poll
     accepted: bool = False
     finished: bool = False
     executed: bool = False
+    snapshot: Optional[int] = None
 
 
 class Governance(Account, StateMixin):
@@ -173,6 +336,7 @@ class Governance(Account, StateMixin):
         self.organization_name = organization_name
         self.founders = founders
         self.staked_tokens = {}
+        self.stake_history = StakeHistory()
         self.token = None
         self.proposals = []
 
@@ -184,13 +348,60 @@ class Governance(Account, StateMixin):
 
         self.set_state('Genesis')
 
+    @property
+    def founders(self) -> List[Account]:
+        """Founders as given, assign a new list to change them
+
+        Founder checks use a set built on assignment, changing the list in
+        place doesn't update it.
+        """
+        return self._founders
+
+    @founders.setter
+    def founders(self, founders: List[Account]):
+        self._founders = founders if isinstance(founders, Sequence) else list(founders)
+        self._founder_set = set(self._founders)
+
+    @property
+    def staked_tokens(self) -> Mapping[Account, int]:
+        """Read-only view of the live stakes by account
+
+        Stakes change through _set_stake, which keeps total_staked and
+        stake_history valid. Assigning a new mapping copies it and leaves
+        stake_history untouched.
+        """
+        return self._staked_view
+
+    @staked_tokens.setter
+    def staked_tokens(self, staked_tokens: Mapping[Account, int]):
+        self._staked_tokens = dict(staked_tokens)
+        self._staked_view = MappingProxyType(self._staked_tokens)
+        self._total_staked = sum(self._staked_tokens.values())
+
     @property
     def total_staked(self):
-        return sum(self.staked_tokens.values())
+        return self._total_staked
 
     @property
     def total_stakers(self):
-        return len(self.staked_tokens.keys())
+        return len(self._staked_tokens)
+
+    def _set_stake(self, account: Account, stake: int):
+        self._total_staked += stake - self._staked_tokens.get(account, 0)
+        self._staked_tokens[account] = stake
+        self.stake_history.record(account, stake, (self._total_staked, len(self._staked_tokens)))
+
+    def stake_at(self, account: Account, snapshot: Optional[int]) -> int:
+        """Returns the stake of account as of the snapshot, the live one if snapshot is None"""
+        if snapshot is None:
+            return self._staked_tokens.get(account, 0)
+        return self.stake_history.stake_at(account, snapshot)
+
+    def totals_at(self, snapshot: Optional[int]):
+        """Returns total staked and total stakers as of the snapshot"""
+        if snapshot is None:
+            return self._total_staked, len(self._staked_tokens)
+        return self.stake_history.total_at(snapshot)
 
     @require_state(['Genesis'])
     def set_token(self, token: TingesToken):
@@ -198,27 +409,45 @@ class Governance(Account, StateMixin):
 
     @require_state(['Genesis'])
     def mint_to_founder(self, founder: Account, amount: int):
-        if founder not in self.founders:
+        if founder not in self._founder_set:
             raise AccountNotFounder()
 
         if self.token:
             self.token.mint(founder, amount)
-            self.staked_tokens[founder] = self.staked_tokens.get(founder, 0) + amount
+            self._set_stake(founder, self._staked_tokens.get(founder, 0) + amount)
         else:
             raise TokenIsNotSet()
 
+    @require_state(['Genesis'])
+    def mint_to_founders(self, founders: List[Account], amounts: List[int]):
+        """Mints and stakes amounts[i] tokens for founders[i] in one call"""
+        if not self._founder_set.issuperset(founders):
+            raise AccountNotFounder()
+
+        if not self.token:
+            raise TokenIsNotSet()
+
+        amounts = [int(a) for a in amounts]
+        self.token.mint_many(founders, amounts)
+        for founder, amount in zip(founders, amounts):
+            self._set_stake(founder, self._staked_tokens.get(founder, 0) + amount)
+
     @require_state(['Genesis'])
     def finish_genesis(self):
         self.set_state('Private')
 
+    @probe()
     @check_caller('staker')
     @require_state(['Private', 'Public'])
-    def create_proposal(self, description: str, exec_data: str) -> Proposal:
-        poll = Poll(governance=self)
+    def create_proposal(self, description: str, exec_data) -> Proposal:
+        _check_exec_data(exec_data)
+        snapshot = self.stake_history.snapshot()
+        poll = Poll(governance=self, snapshot=snapshot)
         proposal = Proposal(
             description=description,
             exec_data=exec_data,
-            poll=poll
+            poll=poll,
+            snapshot=snapshot
         )
 
         self.proposals.append(proposal)
@@ -226,33 +455,56 @@ class Governance(Account, StateMixin):
         return proposal
 
     def can_vote(self, account: Account) -> bool:
-        return account in self.staked_tokens.keys()
+        return account in self._staked_tokens
+
+    @probe()
+    def can_vote_many(self, accounts: List[Account]) -> List[bool]:
+        staked_tokens = self._staked_tokens
+        return [account in staked_tokens for account in accounts]
+
+    @probe()
+    def register_vote(self, poll: Poll, account: Account, in_favor: bool):
+        """Adds the stake of account to the running totals of poll"""
+        stake = self.stake_at(account, poll.snapshot)
+        if in_favor:
+            poll.tokens_for += stake
+        else:
+            poll.tokens_against += stake
+
+    @probe()
+    def register_votes(self, poll: Poll, accounts: List[Account], in_favor: bool):
+        """Adds the stakes of accounts to the running totals of poll"""
+        if poll.snapshot is None:
+            staked_tokens = self._staked_tokens
+            stake = sum(staked_tokens.get(account, 0) for account in accounts)
+        else:
+            stake_at = self.stake_history.stake_at
+            stake = sum(stake_at(account, poll.snapshot) for account in accounts)
+        if in_favor:
+            poll.tokens_for += stake
+        else:
+            poll.tokens_against += stake
 
+    @probe()
     def can_finish_poll(self, poll: Poll) -> bool:
-        total_voted_tokens = 0
-
-        for v in poll.votes_for + poll.votes_against:
-            total_voted_tokens += self.staked_tokens.get(v, 0)
+        total_voted_tokens = poll.tokens_for + poll.tokens_against
+        _, total_stakers = self.totals_at(poll.snapshot)
 
-        return total_voted_tokens / self.total_stakers > self.min_involv_prcnt / 100
+        return total_voted_tokens / total_stakers > self.min_involv_prcnt / 100
 
+    @probe()
     def compute_poll_result(self, poll: Poll) -> bool:
-        tokens_for = 0
-        for v in poll.votes_for:
-            tokens_for += self.staked_tokens.get(v, 0)
+        total_staked, _ = self.totals_at(poll.snapshot)
 
-        tokens_against = 0
-        for v in poll.votes_against:
-            tokens_against += self.staked_tokens.get(v, 0)
-
-        if tokens_for / self.total_staked > self.min_cons_vote_prcnt / 100:
+        if poll.tokens_for / total_staked > self.min_cons_vote_prcnt / 100:
             return True
 
-        if tokens_against / self.total_staked > self.min_cons_vote_prcnt / 100:
+        if poll.tokens_against / total_staked > self.min_cons_vote_prcnt / 100:
             return False
 
         raise ConsesusNotReached()
 
+    @probe()
     @check_caller('staker')
     @require_state(['Private', 'Public'])
     def finish_proposal_poll(self, proposal: Proposal):
@@ -266,16 +518,47 @@ class Governance(Account, StateMixin):
         else:
             raise PollCantBeFinished()
 
+    @probe()
     @check_caller('staker')
     @require_state(['Private', 'Public'])
-    def execute_proposal(self, proposal: Proposal):  # pylint: disable=no-self-use
+    def execute_proposal(self, proposal: Proposal):
         if not proposal.executed and proposal.finished and proposal.accepted:
-            exec(proposal.exec_data)  # pylint: disable=exec-used
-
-            proposal.executed = True
+            self._execute(proposal)
         else:
             raise CantExecutreProposal()
 
+    @probe()
+    @check_caller('staker')
+    @require_state(['Private', 'Public'])
+    def execute_proposals(self, proposals: List[Proposal]):
+        """Executes accepted proposals in order
+
+        All proposals are checked first, so none is executed if one of them
+        can't be. The actions are not rolled back though: if one raises, the
+        proposals executed before it stay executed.
+        """
+        if len({id(p) for p in proposals}) != len(proposals):
+            raise CantExecutreProposal()
+
+        for proposal in proposals:
+            if proposal.executed or not proposal.finished or not proposal.accepted:
+                raise CantExecutreProposal()
+
+        for proposal in proposals:
+            self._execute(proposal)
+
+    def _execute(self, proposal: Proposal):
+        exec_data = proposal.exec_data
+        if isinstance(exec_data, str):
+            exec(compile_exec_data(exec_data))  # pylint: disable=exec-used
+        elif isinstance(exec_data, ProposalAction):
+            exec_data()
+        else:
+            for action in exec_data:
+                action()
+
+        proposal.executed = True
+
     @check_caller('Governance')
     @require_state(['Private', 'Public'])
     def add_bucket(self, bucket: Bucket):
@@ -0,0 +1,131 @@
+"""Copy-on-write forks of model state
+
+A fork copies the contracts reachable from its roots (Governance, tokens,
+buckets, taps, polls and simulated clocks) while plain accounts are shared.
+Dict ledgers of the parent and the fork become overlays on top of the same
+frozen balances, so each side only stores the balances it changes; indexed
+ledgers share their pages until the first write to each.
+
+Forked contracts keep the addresses and indices of their originals and are
+not registered. ProposalActions are pointed to the forked contracts, while
+string exec_data looking contracts up by address (Account.lookup) finds the
+originals.
+"""
+import copy
+from dataclasses import replace
+
+from models.clock import SimulatedClock
+from models.dao import Bucket, Governance, ProposalAction, Tap
+from models.ledger import BalancesOverlay, IndexedBalances
+from models.poll import Poll
+from models.tokens import ERC20Token
+from models.topology import ChainVersion
+
+# Overlays deeper than this are merged into a new frozen base
+MAX_OVERLAY_DEPTH = 16
+
+FORKED = (Governance, ERC20Token, Bucket, Tap, Poll, SimulatedClock)
+
+
+def _fork_balances(token: ERC20Token, twin: ERC20Token):
+    balances = token.balances
+    if isinstance(balances, IndexedBalances):
+        twin.balances = balances.fork()
+        return
+
+    depth = 1
+    if isinstance(balances, BalancesOverlay):
+        if balances.depth >= MAX_OVERLAY_DEPTH:
+            balances = balances.merged()
+        elif not dict.__len__(balances):
+            balances, depth = balances.base, balances.depth
+        else:
+            depth = balances.depth + 1
+
+    token.balances = BalancesOverlay(balances, depth)
+    twin.balances = BalancesOverlay(balances, depth)
+
+
+class _Forker:
+    def __init__(self):
+        self.copies = {}
+        self.pending = []
+        self.chain_versions = {}
+
+    def ref(self, obj):
+        if not isinstance(obj, FORKED):
+            return obj
+
+        twin = self.copies.get(id(obj))
+        if twin is None:
+            twin = self.copies[id(obj)] = copy.copy(obj)
+            self.pending.append((obj, twin))
+        return twin
+
+    def action(self, action: ProposalAction) -> ProposalAction:
+        return replace(
+            action,
+            target=self.ref(action.target),
+            args=[self.ref(v) for v in action.args],
+            kwargs={key: self.ref(v) for key, v in action.kwargs.items()})
+
+    def exec_data(self, exec_data):
+        if isinstance(exec_data, str):
+            return exec_data
+        if isinstance(exec_data, ProposalAction):
+            return self.action(exec_data)
+        return [self.action(a) for a in exec_data]
+
+    def fix(self, obj, twin):
+        """Points the fields of the shallow copy twin to forked objects"""
+        if isinstance(obj, Governance):
+            twin.founders = list(obj.founders)
+            twin.staked_tokens = obj.staked_tokens
+            twin.stake_history = obj.stake_history.copy()
+            twin.token = self.ref(obj.token)
+            twin.proposals = [
+                replace(p, poll=self.ref(p.poll), exec_data=self.exec_data(p.exec_data))
+                for p in obj.proposals
+            ]
+            twin.buckets = [self.ref(b) for b in obj.buckets]
+            twin.taps = {key: self.ref(tap) for key, tap in obj.taps.items()}
+        elif isinstance(obj, ERC20Token):
+            _fork_balances(obj, twin)
+            twin.changed = set(obj.changed) if obj.changed is not None else None
+            twin.journal = None
+        elif isinstance(obj, Bucket):
+            twin.token = self.ref(obj.token)
+            twin.overflow_bkt = self.ref(obj.overflow_bkt)
+            twin.clock = self.ref(obj.clock)
+            twin.journal = None
+            twin._chain_cache = None  # pylint: disable=protected-access
+            group = self.chain_versions.get(id(obj.chain_version))
+            if group is None:
+                group = self.chain_versions[id(obj.chain_version)] = ChainVersion(twin)
+            else:
+                group.buckets.append(twin)
+            twin.chain_version = group
+        elif isinstance(obj, Tap):
+            twin.withdrawer = self.ref(obj.withdrawer)
+            twin.bucket = self.ref(obj.bucket)
+            twin.clock = self.ref(obj.clock)
+            twin.journal = None
+        elif isinstance(obj, Poll):
+            twin.governance = self.ref(obj.governance)
+            twin.votes_for = list(obj.votes_for)
+            twin.votes_against = list(obj.votes_against)
+            twin.voters = set(obj.voters)
+
+    def fork(self, roots) -> list:
+        twins = [self.ref(r) for r in roots]
+        while self.pending:
+            self.fix(*self.pending.pop())
+        return twins
+
+
+def fork(*roots) -> list:
+    """Forks the contracts reachable from roots, returns the forked roots in the given order
+
+    Journals are not carried over to the fork, attach a new one if needed.
+    """
+    return _Forker().fork(roots)
@@ -1,4 +1,5 @@
 """Helpful mixins and decorator"""
+from functools import wraps
 from typing import List
 
 
@@ -11,6 +12,8 @@ class StateDoesNotExists(Exception):
 
 
 class StateMixin:
+    __slots__ = ()
+
     state_list: List[str]
     current_state: str
 
@@ -22,6 +25,7 @@ class StateMixin:
 
 def require_state(states: List[str]):
     def decorator(func):
+        @wraps(func)
         def wrapper(self, *args, **kwargs):
             if self.current_state in states:
                 return func(self, *args, **kwargs)
@@ -39,3 +43,16 @@ def check_caller(caller_name: str):
         return func
 
     return wrapper
+
+
+def probe(histogram: bool = False):
+    """Marks a method to be measured by models.instrumentation
+
+    With histogram the returned values are counted too. Marking costs
+    nothing, the method is only wrapped for instrumented objects.
+    """
+    def wrapper(func):
+        func.probe = {'histogram': histogram}
+        return func
+
+    return wrapper
@@ -0,0 +1,132 @@
+"""Opt-in call counters, timers and histograms for the model hot paths
+
+Methods marked with helpers.probe are measured only on objects attached to
+an Instrumentation. Attaching switches the class of the object to a
+generated subclass wrapping the marked methods, so objects which are not
+attached run the plain methods and pay nothing.
+"""
+import json
+from collections import Counter
+from functools import wraps
+from time import perf_counter_ns
+
+import pandas as pd
+
+
+def instrumented_base(cls):
+    """Returns the model class behind a generated instrumented class"""
+    return cls.__dict__.get('instrumented_base', cls)
+
+
+def _probes(cls):
+    """Returns {name: function} of the probed methods of cls, nearest definition first"""
+    probes = {}
+    for klass in cls.__mro__:
+        for name, func in vars(klass).items():
+            if name not in probes and callable(func):
+                probes[name] = func
+    return {name: func for name, func in probes.items() if hasattr(func, 'probe')}
+
+
+class Instrumentation:
+    """Collects the calls of probed methods of the attached objects
+
+    Times are inclusive, e.g. Bucket.flush includes the transfers it makes.
+    With trace every call is kept as a Chrome trace event.
+    """
+
+    def __init__(self, trace: bool = False):
+        self.trace = trace
+        self.stats = {}
+        self.histograms = {}
+        self.events = []
+        self._classes = {}
+
+    def _wrap(self, func, key: str):
+        stats = self.stats.setdefault(key, [0, 0])
+        histogram = self.histograms.setdefault(key, Counter()) if func.probe['histogram'] else None
+        events = self.events if self.trace else None
+
+        @wraps(func)
+        def wrapper(obj, *args, **kwargs):
+            start = perf_counter_ns()
+            try:
+                result = func(obj, *args, **kwargs)
+            finally:
+                elapsed = perf_counter_ns() - start
+                stats[0] += 1
+                stats[1] += elapsed
+                if events is not None:
+                    events.append((key, start, elapsed))
+
+            if histogram is not None:
+                histogram[result] += 1
+            return result
+
+        return wrapper
+
+    def _instrumented_class(self, cls):
+        if cls not in self._classes:
+            probes = _probes(cls)
+            if not probes:
+                self._classes[cls] = None
+            else:
+                namespace = {
+                    name: self._wrap(func, func.__qualname__) for name, func in probes.items()
+                }
+                # Same layout as cls, required to switch __class__ of slotted objects
+                namespace['__slots__'] = ()
+                namespace['instrumented_base'] = cls
+                namespace['__module__'] = cls.__module__
+                # Checkpoints store the model class path of instrumented objects
+                namespace['__qualname__'] = cls.__qualname__
+                self._classes[cls] = type(cls.__name__, (cls,), namespace)
+
+        return self._classes[cls]
+
+    def attach(self, *objects):
+        """Starts measuring the objects, e.g. all the values of a Registry"""
+        for obj in objects:
+            cls = instrumented_base(type(obj))
+            instrumented = self._instrumented_class(cls)
+            if instrumented is not None:
+                obj.__class__ = instrumented
+
+    @staticmethod
+    def detach(*objects):
+        """Stops measuring the objects"""
+        for obj in objects:
+            obj.__class__ = instrumented_base(type(obj))
+
+    def reset(self):
+        for stats in self.stats.values():
+            stats[0] = stats[1] = 0
+        for histogram in self.histograms.values():
+            histogram.clear()
+        self.events.clear()
+
+    def summary(self) -> pd.DataFrame:
+        """Returns calls, total seconds and mean microseconds per method, slowest first"""
+        df = pd.DataFrame(
+            [(key, calls, ns / 1e9) for key, (calls, ns) in self.stats.items() if calls],
+            columns=['method', 'calls', 'seconds'])
+        df['mean_us'] = df.seconds / df.calls * 1e6
+        return df.set_index('method').sort_values('seconds', ascending=False)
+
+    def report(self) -> str:
+        """Returns the summary and the histograms as text"""
+        lines = [self.summary().to_string(float_format=lambda v: f'{v:.6f}')]
+        for key, histogram in self.histograms.items():
+            if histogram:
+                lines.append(f'\n{key} histogram')
+                lines.extend(f'{value!r:>10} {count}' for value, count in sorted(histogram.items()))
+        return '\n'.join(lines)
+
+    def write_trace(self, path):
+        """Writes the traced calls as a Chrome trace (chrome://tracing, Perfetto) JSON file"""
+        events = [
+            {'name': key, 'ph': 'X', 'ts': start / 1000, 'dur': elapsed / 1000, 'pid': 0, 'tid': 0}
+            for key, start, elapsed in self.events
+        ]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ns'}, f)
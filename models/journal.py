@@ -0,0 +1,116 @@
+"""Opt-in columnar journal of model events"""
+import numpy as np
+import pandas as pd
+
+from models.clock import SYSTEM_CLOCK
+
+EVENTS = ('Mint', 'Transfer', 'Overflow', 'Withdraw', 'TapWithdraw', 'RateChange')
+MINT, TRANSFER, OVERFLOW, WITHDRAW, TAP_WITHDRAW, RATE_CHANGE = range(len(EVENTS))
+
+COLUMNS = {
+    'time': np.int64,
+    'event': np.int8,
+    'emitter': np.int64,
+    'frm': np.int64,
+    'to': np.int64,
+    'amount': np.int64,
+}
+
+
+class Journal:
+    """Append-only log of Mint/Transfer, bucket Overflow/Withdraw and tap TapWithdraw/RateChange
+
+    Events are written into preallocated chunks of chunk_size rows holding a
+    numpy array per column. Accounts are stored by Account.index (-1 when
+    there is none), the time in seconds of the clock. Nothing is recorded
+    until the journal is attached to the contracts.
+    """
+
+    def __init__(self, clock=None, chunk_size: int = 65536):
+        self.clock = clock or SYSTEM_CLOCK
+        self.chunk_size = chunk_size
+        self.chunks = []
+        self.position = chunk_size
+        self.size = 0
+
+    def attach(self, *contracts):
+        """Makes the given tokens, buckets and taps record their events here"""
+        for contract in contracts:
+            contract.journal = self
+
+    def _next_chunk(self):
+        self.chunks.append({
+            name: np.empty(self.chunk_size, dtype=dtype) for name, dtype in COLUMNS.items()
+        })
+        self.position = 0
+
+    def record(self, event: int, emitter: int, frm: int, to: int, amount: int):
+        if self.position == self.chunk_size:
+            self._next_chunk()
+
+        chunk = self.chunks[-1]
+        i = self.position
+        chunk['time'][i] = self.clock.timestamp()
+        chunk['event'][i] = event
+        chunk['emitter'][i] = emitter
+        chunk['frm'][i] = frm
+        chunk['to'][i] = to
+        chunk['amount'][i] = amount
+
+        self.position += 1
+        self.size += 1
+
+    def record_many(self, event: int, emitter: int, frm, to, amount):
+        """Records a batch of events of one kind, frm/to/amount are sequences or scalars"""
+        rows = np.broadcast_arrays(
+            np.asarray(frm, dtype=np.int64), np.asarray(to, dtype=np.int64),
+            np.asarray(amount, dtype=np.int64))
+        time = self.clock.timestamp()
+        total = len(rows[0]) if rows[0].ndim else 1
+        done = 0
+
+        while done < total:
+            if self.position == self.chunk_size:
+                self._next_chunk()
+
+            chunk = self.chunks[-1]
+            n = min(self.chunk_size - self.position, total - done)
+            part = slice(self.position, self.position + n)
+            chunk['time'][part] = time
+            chunk['event'][part] = event
+            chunk['emitter'][part] = emitter
+            for name, column in zip(('frm', 'to', 'amount'), rows):
+                chunk[name][part] = column[done:done + n] if column.ndim else column
+
+            self.position += n
+            self.size += n
+            done += n
+
+    def __len__(self):
+        return self.size
+
+    def _frame(self, columns) -> pd.DataFrame:
+        return pd.DataFrame({
+            'time': columns['time'].view('datetime64[s]'),
+            'event': pd.Categorical.from_codes(columns['event'], EVENTS),
+            'emitter': columns['emitter'],
+            'frm': columns['frm'],
+            'to': columns['to'],
+            'amount': columns['amount'],
+        }, copy=False)
+
+    def iter_frames(self):
+        """Yields a DataFrame per chunk, the columns are views of the journal arrays"""
+        for n, chunk in enumerate(self.chunks):
+            filled = self.position if n == len(self.chunks) - 1 else self.chunk_size
+            yield self._frame({name: column[:filled] for name, column in chunk.items()})
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Returns all events, without copying while they fit into one chunk"""
+        frames = list(self.iter_frames())
+        if len(frames) == 1:
+            return frames[0]
+        if not frames:
+            return self._frame({name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS.items()})
+
+        return pd.concat(frames, ignore_index=True)
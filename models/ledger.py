@@ -0,0 +1,271 @@
+"""Compact balances storage for tokens with many holders"""
+from array import array
+from collections.abc import Mapping
+
+import numpy as np
+
+from models.registry import AddressCollision
+
+# Balances are kept in pages of 2 ** PAGE_BITS accounts by Account.index
+PAGE_BITS = 10
+PAGE_SIZE = 1 << PAGE_BITS
+PAGE_MASK = PAGE_SIZE - 1
+
+# Balance of the accounts of a page which hold no tokens of the ledger
+ABSENT = -2 ** 63
+EMPTY_PAGE = array('q', [ABSENT]) * PAGE_SIZE
+
+
+class IndexedBalances(Mapping):
+    """Balances kept in int64 pages indexed by Account.index
+
+    Reads as the address -> balance mapping ERC20Token.balances is, while a
+    holder costs 8 bytes of balance and a pointer to the account instead of
+    a dict entry and a boxed int. Pages are only allocated for the index
+    ranges holding tokens, so a ledger with a few holders stays small however
+    many accounts exist.
+
+    Forks share the pages and copy a page on the first write to it, so each
+    side only stores the pages it changes. The address -> index map needed to
+    look balances up by address is built on the first such lookup; distinct
+    holders with the same address (e.g. created by registries with the same
+    seed) raise AddressCollision there.
+    """
+
+    __slots__ = ('pages', 'accounts', 'shared', 'count', 'addresses')
+
+    def __init__(self):
+        self.pages = []
+        self.accounts = []
+        self.shared = set()
+        self.count = 0
+        self.addresses = None
+
+    def fork(self) -> 'IndexedBalances':
+        """Returns a ledger sharing the pages with this one until either writes them"""
+        twin = IndexedBalances()
+        twin.pages, twin.accounts, twin.count = list(self.pages), list(self.accounts), self.count
+        self.shared = {page_no for page_no, page in enumerate(self.pages) if page is not None}
+        twin.shared = set(self.shared)
+        return twin
+
+    def _page(self, page_no: int) -> array:
+        """Returns the writable page page_no, allocating or copying it if needed"""
+        pages = self.pages
+        if page_no >= len(pages):
+            missing = page_no + 1 - len(pages)
+            pages.extend([None] * missing)
+            self.accounts.extend([None] * missing)
+
+        if pages[page_no] is None:
+            pages[page_no] = EMPTY_PAGE[:]
+            self.accounts[page_no] = np.empty(PAGE_SIZE, dtype=object)
+        elif page_no in self.shared:
+            pages[page_no] = pages[page_no][:]
+            self.accounts[page_no] = self.accounts[page_no].copy()
+            self.shared.discard(page_no)
+        return pages[page_no]
+
+    def _by_page(self, indices: np.ndarray):
+        """Yields page numbers with the offsets in the page and positions in indices"""
+        if not len(indices):
+            return
+        page_nos = indices >> PAGE_BITS
+        order = np.argsort(page_nos, kind='stable')
+        bounds = np.flatnonzero(np.diff(page_nos[order])) + 1
+        for at in np.split(order, bounds):
+            yield int(page_nos[at[0]]), indices[at] & PAGE_MASK, at
+
+    def _get(self, index: int) -> int:
+        page_no = index >> PAGE_BITS
+        page = self.pages[page_no] if page_no < len(self.pages) else None
+        return ABSENT if page is None else page[index & PAGE_MASK]
+
+    def _enter(self, account):
+        """Records account as a holder, its balance is set by the caller"""
+        if self.addresses is not None:
+            if account.address in self.addresses:
+                raise AddressCollision(account.address)
+            self.addresses[account.address] = account.index
+        self.accounts[account.index >> PAGE_BITS][account.index & PAGE_MASK] = account
+        self.count += 1
+
+    def balance(self, account) -> int:
+        held = self._get(account.index)
+        return 0 if held == ABSENT else held
+
+    def credit(self, account, amount: int):
+        """Adds amount to the balance of account, registering it as a holder"""
+        index = account.index
+        page = self._page(index >> PAGE_BITS)
+        offset = index & PAGE_MASK
+        held = page[offset]
+        if held == ABSENT:
+            self._enter(account)
+            page[offset] = amount
+        else:
+            page[offset] = held + amount
+
+    def move(self, frm, to, amount: int):
+        """Moves amount from the balance of frm to to, registering to as a holder"""
+        pages, shared = self.pages, self.shared
+        sender, receiver = frm.index, to.index
+        try:
+            src = pages[sender >> PAGE_BITS]
+            held = src[sender & PAGE_MASK]
+        except (IndexError, TypeError):
+            held = ABSENT
+        assert held >= amount, 'Insufficient tokens for transfer'
+
+        if shared and (sender >> PAGE_BITS in shared or receiver >> PAGE_BITS in shared):
+            self.credit(to, amount)
+            self.credit(frm, -amount)
+            return
+
+        try:
+            dst = pages[receiver >> PAGE_BITS]
+            received = dst[receiver & PAGE_MASK]
+        except (IndexError, TypeError):
+            received = ABSENT
+        if received == ABSENT:
+            self.credit(to, amount)
+            src[sender & PAGE_MASK] = held - amount
+        else:
+            src[sender & PAGE_MASK] = held - amount
+            dst[receiver & PAGE_MASK] += amount
+
+    def register(self, accounts) -> np.ndarray:
+        """Registers accounts as holders, returns their indices"""
+        indices = np.fromiter((a.index for a in accounts), dtype=np.int64, count=len(accounts))
+        for page_no, offsets, at in self._by_page(indices):
+            page = np.frombuffer(self._page(page_no), dtype=np.int64)
+            offsets, first = np.unique(offsets, return_index=True)
+            absent = page[offsets] == ABSENT
+            for offset, i in zip(offsets[absent].tolist(), at[first[absent]].tolist()):
+                self._enter(accounts[i])
+                page[offset] = 0
+        return indices
+
+    def take(self, indices: np.ndarray) -> np.ndarray:
+        """Returns the balances of the accounts with the given indices, 0 if they hold nothing"""
+        held = np.zeros(len(indices), dtype=np.int64)
+        pages = self.pages
+        for page_no, offsets, at in self._by_page(indices):
+            if page_no < len(pages) and pages[page_no] is not None:
+                held[at] = np.frombuffer(pages[page_no], dtype=np.int64)[offsets]
+        held[held == ABSENT] = 0
+        return held
+
+    def add_at(self, indices: np.ndarray, amounts: np.ndarray):
+        """Adds amounts to the balances of registered holders with the given indices"""
+        for page_no, offsets, at in self._by_page(indices):
+            np.add.at(np.frombuffer(self._page(page_no), dtype=np.int64), offsets, amounts[at])
+
+    def restore(self, indices: np.ndarray, accounts: np.ndarray, amounts: np.ndarray):
+        """Sets the balances of accounts holding nothing yet
+
+        indices are their Account.index values and accounts an object array.
+        Amounts and accounts are copied page by page with numpy, so restoring
+        a checkpoint doesn't register the holders one by one.
+        """
+        for page_no, offsets, at in self._by_page(indices):
+            np.frombuffer(self._page(page_no), dtype=np.int64)[offsets] = amounts[at]
+            self.accounts[page_no][offsets] = accounts[at]
+        self.count += len(accounts)
+        self.addresses = None
+
+    def holdings(self):
+        """Returns the holders and an int64 array of their balances"""
+        holders, amounts = [], [np.zeros(0, dtype=np.int64)]
+        for page, accounts in zip(self.pages, self.accounts):
+            if page is not None:
+                values = np.frombuffer(page, dtype=np.int64)
+                held = values != ABSENT
+                holders.extend(accounts[held].tolist())
+                amounts.append(values[held])
+        return holders, np.concatenate(amounts)
+
+    def holders(self) -> list:
+        return self.holdings()[0]
+
+    def _address_index(self) -> dict:
+        if self.addresses is None:
+            addresses = {}
+            for account in self.holders():
+                if addresses.setdefault(account.address, account.index) != account.index:
+                    raise AddressCollision(account.address)
+            self.addresses = addresses
+        return self.addresses
+
+    def __getitem__(self, address: str) -> int:
+        held = self._get(self._address_index()[address])
+        if held == ABSENT:
+            raise KeyError(address)
+        return held
+
+    def __iter__(self):
+        return (account.address for account in self.holders())
+
+    def __len__(self):
+        return self.count
+
+
+class BalancesOverlay(dict):
+    """Balances dict written on top of a frozen base shared with forks
+
+    Keys missing from the overlay are looked up in the base, written
+    balances are stored in the overlay itself, so reading and updating a
+    balance already written stays a plain dict operation.
+    """
+
+    __slots__ = ('base', 'depth')
+
+    def __init__(self, base: dict, depth: int = 1):
+        super().__init__()
+        self.base = base
+        self.depth = depth
+
+    def __missing__(self, address):
+        return self.base[address]
+
+    def __contains__(self, address):
+        return dict.__contains__(self, address) or address in self.base
+
+    def get(self, address, default=None):
+        try:
+            return self[address]
+        except KeyError:
+            return default
+
+    def merged(self) -> dict:
+        """Returns a plain dict with the balances of the overlay and its bases"""
+        base = self.base
+        merged = base.merged() if isinstance(base, BalancesOverlay) else dict(base)
+        merged.update(dict.items(self))
+        return merged
+
+    def __iter__(self):
+        return iter(self.merged())
+
+    def __len__(self):
+        return len(self.merged())
+
+    def keys(self):
+        return self.merged().keys()
+
+    def values(self):
+        return self.merged().values()
+
+    def items(self):
+        return self.merged().items()
+
+    def __eq__(self, other):
+        if isinstance(other, BalancesOverlay):
+            other = other.merged()
+        return self.merged() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.merged()!r})'
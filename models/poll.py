@@ -1,4 +1,7 @@
+from typing import List, Optional
+
 from models.account import Account
+from models.helpers import probe
 
 
 class AccountCantVote(Exception):
@@ -6,30 +9,72 @@ class AccountCantVote(Exception):
 
 
 class Poll(Account):
-    def __init__(self, governance: 'Governance'):
+    """Stake weighted vote of the governance stakers
+
+    Keeps the set of voters and the running totals of the stakes voted for
+    and against, which the governance updates in register_vote weighting the
+    votes by the stakes as of snapshot (the live ones if it is None).
+    """
+
+    __slots__ = ('governance', 'snapshot', 'votes_for', 'votes_against', 'voters',
+                 'tokens_for', 'tokens_against')
+
+    def __init__(self, governance: 'Governance', snapshot: Optional[int] = None):
         super().__init__()
 
         self.governance = governance
+        self.snapshot = snapshot
         self.votes_for = []
         self.votes_against = []
+        self.voters = set()
+        self.tokens_for = 0
+        self.tokens_against = 0
 
     @property
     def total_votes(self):
         return len(self.votes_for) + len(self.votes_against)
 
     def can_vote(self, account: Account):
-        return account not in self.votes_for and \
-         account not in self.votes_against and \
-         self.governance.can_vote(account)
+        return account not in self.voters and self.governance.can_vote(account)
 
+    @probe()
     def vote_for(self, account: Account):
         if self.can_vote(account):
             self.votes_for.append(account)
+            self.voters.add(account)
+            self.governance.register_vote(self, account, True)
         else:
             raise AccountCantVote()
 
+    @probe()
     def vote_against(self, account: Account):
         if self.can_vote(account):
             self.votes_against.append(account)
+            self.voters.add(account)
+            self.governance.register_vote(self, account, False)
         else:
             raise AccountCantVote()
+
+    @probe()
+    def vote_many(self, accounts: List[Account], in_favor: bool) -> List[Account]:
+        """Casts the votes of all eligible accounts, returns the rejected ones
+
+        Accounts which can't vote, already voted or repeat in accounts are
+        rejected, the first vote of a repeated account counts.
+        """
+        eligible = self.governance.can_vote_many(accounts)
+        voters = self.voters
+        accepted = []
+        rejected = []
+
+        for account, can_vote in zip(accounts, eligible):
+            if can_vote and account not in voters:
+                voters.add(account)
+                accepted.append(account)
+            else:
+                rejected.append(account)
+
+        (self.votes_for if in_favor else self.votes_against).extend(accepted)
+        self.governance.register_votes(self, accepted, in_favor)
+
+        return rejected
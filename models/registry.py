@@ -0,0 +1,94 @@
+"""Scoped storage of accounts with deterministic addresses"""
+import weakref
+from collections.abc import Mapping
+from contextvars import ContextVar
+from hashlib import blake2b
+from itertools import count
+
+ADDRESS_SIZE = 20
+
+# Account indices are unique in the process, whatever registry creates the account
+INDEX_COUNTER = count()
+
+# Serial numbers of unseeded registries, which keep their counter addresses apart
+_SERIALS = count()
+
+_ACTIVE = ContextVar('registry', default=None)
+
+
+class AddressCollision(Exception):
+    pass
+
+
+def current_registry():
+    """Returns the registry active in the current context, None if accounts go to the global one"""
+    return _ACTIVE.get()
+
+
+class Registry(Mapping):
+    """Address -> account storage of one model
+
+    Accounts created while the registry is active (see activate or use it as a
+    context manager) are stored here instead of Account.ACCOUNTS_STORAGE.
+    Their addresses are derived from a counter of the registry, hashed with
+    the seed if one is given, so the same model code creates the same
+    addresses on every run. Unseeded registries put their serial number in
+    the high bytes of the address, so they don't hand out the same ones;
+    registries with the same seed do. Indices come from the process-wide
+    INDEX_COUNTER and never repeat. A weak registry doesn't keep
+    unreferenced accounts alive.
+
+    The activation is scoped by contextvars, so simulations in different
+    threads or tasks can use their own registries.
+    """
+
+    def __init__(self, seed=None, weak: bool = False):
+        self.accounts = weakref.WeakValueDictionary() if weak else {}
+        self.counter = count()
+        self.key = None
+        self.serial = None
+        if seed is not None:
+            self.key = seed if isinstance(seed, bytes) else str(seed).encode()
+        else:
+            self.serial = next(_SERIALS)
+        self._tokens = []
+
+    def address(self, number: int) -> str:
+        """Returns the address of the account created number-th in this registry"""
+        if self.key is None:
+            number |= self.serial << 8 * (ADDRESS_SIZE - 8)
+            return '0x' + number.to_bytes(ADDRESS_SIZE, 'big').hex()
+
+        return '0x' + blake2b(
+            number.to_bytes(8, 'big'), digest_size=ADDRESS_SIZE, key=self.key).hexdigest()
+
+    def add(self, account, address: str = None):
+        """Assigns index and address (a new one unless given) to account and stores it"""
+        account.address = address or self.address(next(self.counter))
+        account.index = next(INDEX_COUNTER)
+        self.accounts[account.address] = account
+
+    def discard(self, account):
+        self.accounts.pop(account.address, None)
+
+    def activate(self):
+        self._tokens.append(_ACTIVE.set(self))
+
+    def deactivate(self):
+        _ACTIVE.reset(self._tokens.pop())
+
+    def __enter__(self) -> 'Registry':
+        self.activate()
+        return self
+
+    def __exit__(self, *exc):
+        self.deactivate()
+
+    def __getitem__(self, address: str):
+        return self.accounts[address]
+
+    def __iter__(self):
+        return iter(self.accounts)
+
+    def __len__(self):
+        return len(self.accounts)
@@ -0,0 +1,128 @@
+"""Discrete-event simulation of the token economy"""
+import heapq
+from datetime import datetime, timedelta
+from itertools import count
+
+import numpy as np
+
+from models.clock import SimulatedClock
+from models.dao import PollCantBeFinished, ConsesusNotReached
+
+
+class EventInPast(Exception):
+    pass
+
+
+class Simulator:
+    """Runs timestamped events in time order, jumping the clock from one event to the next
+
+    Contracts of the simulated model must be created with the simulator clock.
+    Events scheduled for the same second run in the order they were scheduled.
+    """
+
+    def __init__(self, clock: SimulatedClock):
+        self.clock = clock
+        self.queue = []
+        self.sequence = count()
+        self.processed = 0
+
+    def _seconds(self, at) -> int:
+        if isinstance(at, np.datetime64):
+            at = at.astype('datetime64[s]').item()
+        return int((at - self.clock.start).total_seconds())
+
+    def schedule(self, at: datetime, action, *args, **kwargs):
+        """Schedules action(*args, **kwargs) to be called at the given time"""
+        seconds = self._seconds(at)
+        if seconds < self.clock.seconds:
+            raise EventInPast()
+
+        heapq.heappush(self.queue, (seconds, next(self.sequence), action, args, kwargs))
+
+    def schedule_every(self, start: datetime, interval: timedelta, action, *args,
+                       until: datetime = None, **kwargs):
+        """Schedules action at start and then every interval while not later than until
+
+        Only the next occurrence is kept in the queue.
+        """
+        def repeat():
+            action(*args, **kwargs)
+            following = self.clock.now() + interval
+            if until is None or following <= until:
+                self.schedule(following, repeat)
+
+        self.schedule(start, repeat)
+
+    def schedule_payments(self, payments, token, entry_bucket):
+        """Mints time ordered (date, amount) payments to entry_bucket and flushes it
+
+        payments may be any iterable, it is consumed one payment at a time.
+        """
+        payments = iter(payments)
+
+        def feed():
+            payment = next(payments, None)
+            if payment is not None:
+                self.schedule(payment[0], pay, int(payment[1]))
+
+        def pay(amount):
+            token.mint(entry_bucket, amount)
+            entry_bucket.flush()
+            feed()
+
+        feed()
+
+    def schedule_withdraw(self, at: datetime, tap, amount: int = None):
+        """Withdraws amount from the tap, or everything available if amount is None"""
+        if amount is None:
+            self.schedule(at, tap.withdraw_all)
+        else:
+            self.schedule(at, tap.withdraw, amount)
+
+    def schedule_set_rate(self, at: datetime, tap, rate: int):
+        self.schedule(at, tap.set_rate, rate)
+
+    def schedule_proposal(self, at: datetime, governance, description: str, exec_data,
+                          votes_for=(), votes_against=(), finish_at: datetime = None,
+                          execute: bool = True):
+        """Creates a proposal, casts the votes and finishes (and executes) its poll
+
+        Polls which can't be finished or don't reach consensus are left unfinished.
+        """
+        def create():
+            proposal = governance.create_proposal(description=description, exec_data=exec_data)
+            for account in votes_for:
+                proposal.poll.vote_for(account)
+            for account in votes_against:
+                proposal.poll.vote_against(account)
+            self.schedule(finish_at or self.clock.now(), finish, proposal)
+
+        def finish(proposal):
+            try:
+                governance.finish_proposal_poll(proposal)
+            except (PollCantBeFinished, ConsesusNotReached):
+                return
+
+            if execute and proposal.accepted:
+                governance.execute_proposal(proposal)
+
+        self.schedule(at, create)
+
+    def run(self, until: datetime = None) -> int:
+        """Processes events up to until (or all of them), returns the number of processed events"""
+        limit = None if until is None else self._seconds(until)
+        queue = self.queue
+        clock = self.clock
+        processed = 0
+
+        while queue and (limit is None or queue[0][0] <= limit):
+            seconds, _, action, args, kwargs = heapq.heappop(queue)
+            clock.seconds = seconds
+            action(*args, **kwargs)
+            processed += 1
+
+        if limit is not None and clock.seconds < limit:
+            clock.seconds = limit
+
+        self.processed += processed
+        return processed
@@ -0,0 +1,73 @@
+"""Checkpointed history of governance stakes"""
+from array import array
+from bisect import bisect_right
+from typing import Tuple
+
+
+class StakeHistory:
+    """Stakes of every account and their totals as of every snapshot
+
+    A change is recorded under the id of the current snapshot, snapshot()
+    closes it and opens the next one. The stake of an account as of a
+    snapshot is found with bisect over the snapshot ids of its changes, so
+    lookups take O(log n) of its history. Histories of accounts are int64
+    arrays appended in place. Copies of the history share them, as well as
+    the totals, and copy the ones a change is recorded in first.
+    """
+
+    def __init__(self):
+        self.snapshot_id = 0
+        self.accounts = {}
+        self.owned = set()
+        self.total_ids = []
+        self.totals = []
+        self.totals_owned = True
+
+    def snapshot(self) -> int:
+        """Returns the id to look up the current stakes later"""
+        self.snapshot_id += 1
+        return self.snapshot_id - 1
+
+    def record(self, account, stake: int, total: Tuple[int, int]):
+        """Records stake of account and the (total staked, total stakers) after the change"""
+        snapshot_id = self.snapshot_id
+        if account in self.owned:
+            ids, stakes = self.accounts[account]
+        else:
+            ids, stakes = self.accounts.get(account, ((), ()))
+            ids, stakes = self.accounts[account] = (array('q', ids), array('q', stakes))
+            self.owned.add(account)
+
+        if ids and ids[-1] == snapshot_id:
+            stakes[-1] = stake
+        else:
+            ids.append(snapshot_id)
+            stakes.append(stake)
+
+        if not self.totals_owned:
+            self.total_ids, self.totals = list(self.total_ids), list(self.totals)
+            self.totals_owned = True
+        if self.total_ids and self.total_ids[-1] == snapshot_id:
+            self.totals[-1] = total
+        else:
+            self.total_ids.append(snapshot_id)
+            self.totals.append(total)
+
+    def stake_at(self, account, snapshot_id: int) -> int:
+        ids, stakes = self.accounts.get(account, ((), ()))
+        i = bisect_right(ids, snapshot_id)
+        return stakes[i - 1] if i else 0
+
+    def total_at(self, snapshot_id: int) -> Tuple[int, int]:
+        """Returns total staked and total stakers as of the snapshot"""
+        i = bisect_right(self.total_ids, snapshot_id)
+        return self.totals[i - 1] if i else (0, 0)
+
+    def copy(self) -> 'StakeHistory':
+        twin = StakeHistory()
+        twin.snapshot_id = self.snapshot_id
+        twin.accounts = dict(self.accounts)
+        twin.total_ids, twin.totals = self.total_ids, self.totals
+        self.owned = set()
+        self.totals_owned = twin.totals_owned = False
+        return twin
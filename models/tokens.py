@@ -1,12 +1,18 @@
-from typing import Optional
+from typing import List, Optional
 
-from models.helpers import check_caller
+import numpy as np
+
+from models.helpers import check_caller, probe
 from models.account import Account
+from models.journal import MINT, TRANSFER
+from models.ledger import ABSENT, PAGE_BITS, PAGE_MASK, IndexedBalances
 
 
 class ERC20Token(Account):
     """Basic ERC-20 token class with balances and totalSupply"""
 
+    __slots__ = ('balances', 'total_supply', 'changed', 'journal')
+
     name: Optional[str] = None
 
     def __init__(self):
@@ -14,33 +20,104 @@ class ERC20Token(Account):
 
         self.balances = {}
         self.total_supply = 0
+        self.changed = None
+        self.journal = None
+
+    def track_changes(self):
+        """Starts recording addresses of buckets receiving tokens in the changed set
+
+        Only accounts with changes_tracked are recorded, so transfers to
+        withdrawers and other holders don't pile up in the set.
+        """
+        if self.changed is None:
+            self.changed = set()
 
     def balance_of(self, holder: Account) -> int:
         """Returns tokens balance of account"""
 
         return self.balances.get(holder.address, 0)
 
+    @probe()
     @check_caller('Governance')
     def mint(self, to: Account, tokens: int):
         """Mints (creates new amount of) tokens for the given account"""
 
-        if to.address not in self.balances:
-            self.balances[to.address] = 0
-
-        self.balances[to.address] += tokens
+        balances = self.balances
+        try:
+            balances[to.address] += tokens
+        except KeyError:
+            balances[to.address] = tokens
         self.total_supply += tokens
 
+        if self.changed is not None and to.changes_tracked:
+            self.changed.add(to.address)
+        if self.journal is not None:
+            self.journal.record(MINT, self.index, -1, to.index, tokens)
+
+    @probe()
     def transfer(self, frm: Account, to: Account, tokens: int):
         """ERC-20 transfer sends tokens from one account to another"""
 
-        assert self.balances[frm.address] >= tokens, 'Insufficient tokens for transfer'
+        balances = self.balances
+        held = balances[frm.address]
+        assert held >= tokens, 'Insufficient tokens for transfer'
+
+        balances[frm.address] = held - tokens
+        try:
+            balances[to.address] += tokens
+        except KeyError:
+            balances[to.address] = tokens
+
+        if self.changed is not None and to.changes_tracked:
+            self.changed.add(to.address)
+        if self.journal is not None:
+            self.journal.record(TRANSFER, self.index, frm.index, to.index, tokens)
+
+    @check_caller('Governance')
+    def mint_many(self, recipients: List[Account], amounts: List[int]):
+        """Mints amounts[i] tokens for recipients[i] in one pass"""
+
+        assert len(recipients) == len(amounts)
+        amounts = _as_list(amounts)
+        balances = self.balances
+
+        for to, tokens in zip(recipients, amounts):
+            balances[to.address] = balances.get(to.address, 0) + tokens
+        self.total_supply += sum(amounts)
+
+        if self.changed is not None:
+            self.changed.update(to.address for to in recipients if to.changes_tracked)
+        if self.journal is not None:
+            self.journal.record_many(MINT, self.index, -1, _indices(recipients), amounts)
+
+    def transfer_many(self, senders: List[Account], recipients: List[Account],
+                      amounts: List[int]):
+        """Sends amounts[i] tokens from senders[i] to recipients[i]
+
+        Nothing is transferred unless every sender holds all the tokens it
+        sends in the batch.
+        """
 
-        self.balances[frm.address] -= tokens
+        assert len(senders) == len(recipients) == len(amounts)
+        amounts = _as_list(amounts)
+        balances = self.balances
 
-        if to.address not in self.balances:
-            self.balances[to.address] = 0
+        outgoing = {}
+        for frm, tokens in zip(senders, amounts):
+            outgoing[frm.address] = outgoing.get(frm.address, 0) + tokens
+        for address, tokens in outgoing.items():
+            assert balances.get(address, 0) >= tokens, 'Insufficient tokens for transfer'
 
-        self.balances[to.address] += tokens
+        for address, tokens in outgoing.items():
+            balances[address] = balances.get(address, 0) - tokens
+        for to, tokens in zip(recipients, amounts):
+            balances[to.address] = balances.get(to.address, 0) + tokens
+
+        if self.changed is not None:
+            self.changed.update(to.address for to in recipients if to.changes_tracked)
+        if self.journal is not None:
+            self.journal.record_many(
+                TRANSFER, self.index, _indices(senders), _indices(recipients), amounts)
 
     def __str__(self):
         return f'Token {self.name} ({self.address})'
@@ -48,13 +125,133 @@ class ERC20Token(Account):
     __repr__ = __str__
 
 
+class IndexedERC20Token(ERC20Token):
+    """ERC20Token storing integer balances in IndexedBalances
+
+    Looks holders up by Account.index instead of hashing the address. Keeps
+    memory per holder low and lets the batch operations work on whole pages
+    of balances at once.
+    """
+
+    __slots__ = ()
+
+    def __init__(self):
+        super().__init__()
+
+        self.balances = IndexedBalances()
+
+    def balance_of(self, holder: Account) -> int:
+        """Returns tokens balance of account"""
+
+        return self.balances.balance(holder)
+
+    @probe()
+    @check_caller('Governance')
+    def mint(self, to: Account, tokens: int):
+        """Mints (creates new amount of) tokens for the given account"""
+
+        self.balances.credit(to, tokens)
+        self.total_supply += tokens
+
+        if self.changed is not None and to.changes_tracked:
+            self.changed.add(to.address)
+        if self.journal is not None:
+            self.journal.record(MINT, self.index, -1, to.index, tokens)
+
+    @probe()
+    def transfer(self, frm: Account, to: Account, tokens: int):
+        """ERC-20 transfer sends tokens from one account to another"""
+
+        balances = self.balances
+        sender, receiver = frm.index, to.index
+        try:
+            src = balances.pages[sender >> PAGE_BITS]
+            dst = balances.pages[receiver >> PAGE_BITS]
+            held = src[sender & PAGE_MASK]
+            received = dst[receiver & PAGE_MASK]
+        except (IndexError, TypeError):
+            received = ABSENT
+        if received == ABSENT or balances.shared:
+            # Unknown sender, new receiver or pages shared with a fork
+            balances.move(frm, to, tokens)
+        else:
+            assert held >= tokens, 'Insufficient tokens for transfer'
+            src[sender & PAGE_MASK] = held - tokens
+            dst[receiver & PAGE_MASK] += tokens
+
+        if self.changed is not None and to.changes_tracked:
+            self.changed.add(to.address)
+        if self.journal is not None:
+            self.journal.record(TRANSFER, self.index, frm.index, to.index, tokens)
+
+    @check_caller('Governance')
+    def mint_many(self, recipients: List[Account], amounts: List[int]):
+        """Mints amounts[i] tokens for recipients[i] in one pass"""
+
+        assert len(recipients) == len(amounts)
+        amounts = np.asarray(amounts, dtype=np.int64)
+
+        self.balances.add_at(self.balances.register(recipients), amounts)
+        self.total_supply += int(amounts.sum())
+
+        if self.changed is not None:
+            self.changed.update(to.address for to in recipients if to.changes_tracked)
+        if self.journal is not None:
+            self.journal.record_many(MINT, self.index, -1, _indices(recipients), amounts)
+
+    def transfer_many(self, senders: List[Account], recipients: List[Account],
+                      amounts: List[int]):
+        """Sends amounts[i] tokens from senders[i] to recipients[i]
+
+        Nothing is transferred unless every sender holds all the tokens it
+        sends in the batch.
+        """
+
+        assert len(senders) == len(recipients) == len(amounts)
+        balances = self.balances
+        sender_indices = _indices(senders)
+        amounts = np.asarray(amounts, dtype=np.int64)
+
+        unique_senders, positions = np.unique(sender_indices, return_inverse=True)
+        outgoing = np.zeros(len(unique_senders), dtype=np.int64)
+        np.add.at(outgoing, positions, amounts)
+        held = balances.take(unique_senders)
+        assert (held >= outgoing).all(), 'Insufficient tokens for transfer'
+
+        recipient_indices = balances.register(recipients)
+        balances.add_at(sender_indices, -amounts)
+        balances.add_at(recipient_indices, amounts)
+
+        if self.changed is not None:
+            self.changed.update(to.address for to in recipients if to.changes_tracked)
+        if self.journal is not None:
+            self.journal.record_many(
+                TRANSFER, self.index, sender_indices, recipient_indices, amounts)
+
+
+def _as_list(amounts) -> List[int]:
+    return amounts.tolist() if isinstance(amounts, np.ndarray) else list(amounts)
+
+
+def _indices(accounts: List[Account]) -> np.ndarray:
+    return np.fromiter((a.index for a in accounts), dtype=np.int64, count=len(accounts))
+
+
 class TingesToken(ERC20Token):
+    __slots__ = ()
+    name = 'TNG'
+
+
+class IndexedTingesToken(IndexedERC20Token):
+    __slots__ = ()
     name = 'TNG'
 
 
 class DAIStableCoin(ERC20Token):
+    __slots__ = ()
     name = 'DAI'
 
 
 class USDTStableCoin(ERC20Token):
+    __slots__ = ()
     name = 'USDT'
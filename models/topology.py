@@ -0,0 +1,114 @@
+"""Flat representation of a bucket overflow chain"""
+from bisect import bisect_right
+from typing import List
+
+import numpy as np
+
+INT64_MAX = np.iinfo(np.int64).max
+
+
+class InflowInPast(Exception):
+    pass
+
+
+class ChainVersion:
+    """Versions shared by the buckets connected by overflow links
+
+    topology is bumped by set_overflow_bucket and withdrawals by withdraw of
+    any bucket of the group, so cached chains only go stale when buckets
+    they may contain change. Linking two groups merges the smaller one into
+    the larger; groups are never split, unlinked buckets keep sharing versions.
+    """
+
+    __slots__ = ('topology', 'withdrawals', 'buckets')
+
+    def __init__(self, bucket):
+        self.topology = 0
+        self.withdrawals = 0
+        self.buckets = [bucket]
+
+    def link(self, other: 'ChainVersion' = None):
+        """Records a topology change joining other to this group"""
+        group = self
+        if other is not None and other is not self:
+            group, small = (self, other) if len(self.buckets) >= len(other.buckets) else (other, self)
+            for bkt in small.buckets:
+                bkt.chain_version = group
+            group.buckets.extend(small.buckets)
+
+        group.topology += 1
+
+    def key(self):
+        return self, self.topology, self.withdrawals
+
+
+class CompiledChain:
+    """Overflow chain compiled into cumulative capacity boundaries
+
+    Inflow is the total amount the chain ever received, i.e. its balances
+    plus everything withdrawn from it. boundaries[i] is the inflow at which
+    bucket i gets full; the last bucket never gets full. Minting into the
+    entry bucket keeps the boundaries valid, withdrawals and topology changes
+    are picked up on the next query.
+    """
+
+    def __init__(self, entry_bucket):
+        self.entry_bucket = entry_bucket
+        self.version = None
+        self.refresh()
+
+    def refresh(self):
+        """Recompiles the chain from the current balances"""
+        bkt = self.entry_bucket
+        self.version = bkt.chain_version.key()
+        self.buckets = bkt.overflow_chain()
+        self.balances = [b.token.balance_of(b) for b in self.buckets]
+        self.inflow = sum(self.balances) + sum(b.withdrawn for b in self.buckets)
+
+        self.boundaries = []
+        boundary = self.inflow
+        for b, held in zip(self.buckets[:-1], self.balances):
+            boundary = min(boundary + max(b.max_volume - held, 0), INT64_MAX)
+            self.boundaries.append(boundary)
+
+    def _check(self, inflow):
+        bkt = self.entry_bucket
+        if self.version != bkt.chain_version.key():
+            self.refresh()
+
+        if np.any(np.asarray(inflow) < self.inflow):
+            raise InflowInPast()
+
+    def filling_index(self, inflow: int) -> int:
+        """Returns the chain position of the bucket filling at the given total inflow"""
+        self._check(inflow)
+        return bisect_right(self.boundaries, inflow)
+
+    def filling_bucket(self, inflow: int):
+        """Returns the bucket filling at the given total inflow"""
+        index = self.filling_index(inflow)  # may recompile self.buckets
+        return self.buckets[index]
+
+    def holdings(self, inflow: int) -> List[int]:
+        """Returns the balance of every bucket of the chain at the given total inflow"""
+        k = self.filling_index(inflow)
+        start = self.boundaries[k - 1] if k else self.inflow
+
+        return [max(b.max_volume, held) for b, held in zip(self.buckets[:k], self.balances)] \
+            + [self.balances[k] + inflow - start] \
+            + self.balances[k + 1:]
+
+    def filling_index_many(self, inflows) -> np.ndarray:
+        """Vectorized filling_index"""
+        self._check(inflows)
+        return np.searchsorted(np.array(self.boundaries, dtype=np.int64), inflows, side='right')
+
+    def holdings_many(self, inflows) -> np.ndarray:
+        """Vectorized holdings, returns a row of balances per inflow"""
+        inflows = np.asarray(inflows, dtype=np.int64)
+        self._check(inflows)
+
+        starts = np.array([self.inflow] + self.boundaries, dtype=np.int64)
+        free = np.diff(np.append(starts, INT64_MAX))
+        received = np.clip(inflows[:, np.newaxis] - starts, 0, free)
+        return received + np.array(self.balances, dtype=np.int64)
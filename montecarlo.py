@@ -0,0 +1,128 @@
+"""Monte Carlo runs of the bucket filling scenario"""
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from helpers import cascade_payments, generate_payments_array
+from models.dao import Bucket
+from models.registry import Registry
+from models.tokens import ERC20Token
+
+NOT_FILLED = np.iinfo(np.int64).max
+
+
+@dataclass
+class BucketSpec:
+    """Picklable description of a Bucket"""
+    name: str
+    max_volume: int = sys.maxsize
+    withdraw_begin: datetime = None
+
+
+@dataclass
+class ScenarioSpec:
+    """Picklable description of the bucket chain and its random payments"""
+    buckets: List[BucketSpec]
+    date_range: Tuple[datetime, datetime] = (datetime(2019, 1, 1), datetime(2020, 1, 1))
+    amount_range: Tuple[int, int] = (100, 10000)
+    value: int = 1000000
+    distribution: str = 'uniform'
+
+    def build(self):
+        """Creates the token and the overflow chain of buckets"""
+        token = ERC20Token()
+        buckets = [
+            Bucket(
+                name=spec.name,
+                withdraw_begin=spec.withdraw_begin or self.date_range[0],
+                token=token,
+                max_volume=spec.max_volume)
+            for spec in self.buckets
+        ]
+        for parent, child in zip(buckets, buckets[1:]):
+            parent.set_overflow_bucket(child)
+
+        return token, buckets
+
+
+@dataclass
+class MonteCarloResult:
+    """Per-run outcomes and their percentiles"""
+    fill_dates: pd.DataFrame
+    final_balances: pd.DataFrame
+    fill_probability: pd.Series
+    runs_fill_dates: np.ndarray
+    runs_balances: np.ndarray
+
+
+def run_scenario(spec: ScenarioSpec, seed):
+    """Runs one scenario, returns fill times (unix seconds) and final balances per bucket"""
+    # a registry per run keeps the buckets out of Account.ACCOUNTS_STORAGE
+    with Registry():
+        token, buckets = spec.build()
+    dates, amounts = generate_payments_array(
+        date_range=spec.date_range,
+        amount_range=spec.amount_range,
+        value=spec.value,
+        seed=seed,
+        distribution=spec.distribution)
+    _, levels = cascade_payments(amounts, token, buckets[0])
+
+    fill_times = np.full(len(buckets), NOT_FILLED, dtype=np.int64)
+    for i, bkt in enumerate(buckets):
+        filled = levels[:, i] >= bkt.max_volume
+        if filled.any():
+            fill_times[i] = dates[filled.argmax()].astype(np.int64)
+
+    return fill_times, np.array([token.balance_of(b) for b in buckets], dtype=np.int64)
+
+
+def _run_batch(spec, seeds):
+    results = [run_scenario(spec, seed) for seed in seeds]
+    return np.stack([r[0] for r in results]), np.stack([r[1] for r in results])
+
+
+def run_monte_carlo(spec: ScenarioSpec, runs: int, seed=None,
+                    percentiles=(5, 25, 50, 75, 95), max_workers=None, batch_size=None):
+    """Runs independent scenarios in a process pool and aggregates their outcomes
+
+    Each run gets its own random stream spawned from seed. Runs are sent to
+    workers in batches to keep the inter-process traffic low.
+    """
+    max_workers = max_workers or os.cpu_count()
+    batch_size = batch_size or max(runs // (max_workers * 4), 1)
+    seeds = np.random.SeedSequence(seed).spawn(runs)
+    batches = [seeds[i:i + batch_size] for i in range(0, runs, batch_size)]
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(_run_batch, [spec] * len(batches), batches))
+
+    fill_times = np.concatenate([r[0] for r in results])
+    balances = np.concatenate([r[1] for r in results])
+    names = [b.name for b in spec.buckets]
+
+    # Not filled runs sort after any date, nearest rank keeps real observations
+    # (np.percentile(method='nearest') needs numpy 1.22, which needs Python 3.8)
+    ranks = np.around(np.asarray(percentiles) / 100 * (len(fill_times) - 1)).astype(np.int64)
+    fill_percentiles = np.sort(fill_times, axis=0)[ranks]
+    fill_percentiles = np.where(
+        fill_percentiles == NOT_FILLED, np.datetime64('NaT', 's'),
+        fill_percentiles.astype('datetime64[s]'))
+
+    runs_fill_dates = fill_times.astype('datetime64[s]')
+    runs_fill_dates[fill_times == NOT_FILLED] = np.datetime64('NaT', 's')
+
+    return MonteCarloResult(
+        fill_dates=pd.DataFrame(fill_percentiles, index=list(percentiles), columns=names),
+        final_balances=pd.DataFrame(
+            np.percentile(balances, percentiles, axis=0), index=list(percentiles), columns=names),
+        fill_probability=pd.Series((fill_times != NOT_FILLED).mean(axis=0), index=names),
+        runs_fill_dates=runs_fill_dates,
+        runs_balances=balances,
+    )
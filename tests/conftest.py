@@ -1,7 +1,9 @@
+from datetime import datetime
 import pytest
 
 from models.account import Account
-from models.tokens import TingesToken, DAIStableCoin, USDTStableCoin
+from models.dao import Bucket
+from models.tokens import ERC20Token, TingesToken, DAIStableCoin, USDTStableCoin
 
 
 @pytest.fixture
@@ -17,6 +19,23 @@ def generate_accounts():
     return _generate_accounts
 
 
+@pytest.fixture
+def build_chain():
+    def _build_chain(volumes, token=None, withdraw_begin=None):
+        token = token if token is not None else ERC20Token()
+        withdraw_begin = withdraw_begin or datetime.now()
+        buckets = [
+            Bucket(name=f'bkt_{i}', withdraw_begin=withdraw_begin, token=token, max_volume=v)
+            for i, v in enumerate(volumes)
+        ]
+        for parent, child in zip(buckets, buckets[1:]):
+            parent.set_overflow_bucket(child)
+
+        return token, buckets
+
+    return _build_chain
+
+
 @pytest.fixture
 def tinges_token():
     return TingesToken()
@@ -1,6 +1,8 @@
+from datetime import datetime
 import pytest
 
-from models.dao import Governance
+from models.clock import SimulatedClock
+from models.dao import Bucket, Governance, ProposalAction, Tap
 from models.tokens import TingesToken
 from models.account import Account
 
@@ -25,3 +27,27 @@ def governance(generate_accounts):
     governance.finish_genesis()
 
     return governance
+
+
+@pytest.fixture
+def model(governance, dai_stablecoin, account):
+    clock = SimulatedClock(datetime(2019, 1, 1))
+    first = Bucket(name='First', withdraw_begin=datetime(2019, 1, 1), token=dai_stablecoin,
+                   max_volume=1000, clock=clock)
+    second = Bucket(name='Second', withdraw_begin=datetime(2019, 1, 1), token=dai_stablecoin,
+                    clock=clock)
+    first.set_overflow_bucket(second)
+    dai_stablecoin.mint(first, 1500)
+    first.flush()
+    tap = Tap(withdrawer=account, bucket=first, description='Development', rate=2, clock=clock)
+    tap.activate()
+    clock.advance(100)
+    tap.withdraw(50)
+
+    proposal = governance.create_proposal(
+        description='Add bucket',
+        exec_data=ProposalAction(target=governance, method='add_bucket', args=(first,)))
+    for f in governance.founders[:4]:
+        proposal.poll.vote_for(f)
+
+    return governance, dai_stablecoin, first, second, tap
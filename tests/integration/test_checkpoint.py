@@ -0,0 +1,127 @@
+from datetime import datetime
+import numpy as np
+import pytest
+
+from models.account import Account
+from models.checkpoint import save_checkpoint, load_checkpoint, UnsupportedCheckpoint, GRAPH_FILE
+from models.dao import ProposalAction
+from models.registry import Registry
+from models.tokens import IndexedERC20Token
+
+
+def test_restore_model(model, tmp_path):
+    save_checkpoint(tmp_path / 'checkpoint', *model)
+    Account.ACCOUNTS_STORAGE = {}
+
+    governance, token, first, second, tap = load_checkpoint(tmp_path / 'checkpoint')
+    original = model[0]
+
+    assert governance is not original
+    assert governance.organization_name == 'Tinges'
+    assert governance.current_state == 'Private'
+    assert [f.address for f in governance.founders] == [f.address for f in original.founders]
+    assert governance.total_staked == 5000
+    assert governance.token.balance_of(governance.founders[0]) == 1000
+
+    assert token.balance_of(first) == 950
+    assert token.balance_of(second) == 500
+    assert token.balance_of(tap.withdrawer) == 50
+    assert first.overflow_bkt is second
+    assert first.withdrawn == 50
+    assert first.clock is tap.clock is second.clock
+    assert tap.clock.now() == datetime(2019, 1, 1, 0, 1, 40)
+    assert tap.bucket is first
+    assert tap.total_available == 150
+    assert tap.active
+
+    proposal = governance.proposals[0]
+    assert proposal.snapshot == proposal.poll.snapshot == original.proposals[0].snapshot
+    assert governance.stake_at(governance.founders[0], proposal.snapshot) == 1000
+    assert governance.totals_at(proposal.snapshot) == (5000, 5)
+    assert proposal.poll.governance is governance
+    assert proposal.poll.votes_for == governance.founders[:4]
+    assert proposal.poll.votes_against == []
+
+
+def test_restored_model_continues(model, tmp_path):
+    save_checkpoint(tmp_path / 'checkpoint', *model)
+
+    governance, token, first, *_ = load_checkpoint(tmp_path / 'checkpoint')
+    proposal = governance.proposals[0]
+    proposal.poll.vote_for(governance.founders[4])
+    governance.finish_proposal_poll(proposal)
+    governance.execute_proposal(proposal)
+
+    assert governance.buckets == [first]
+
+    token.mint(first, 100)
+    first.flush()
+    assert token.balance_of(first) == 1000
+    assert token.balance_of(first.overflow_bkt) == 550
+
+
+def test_restore_indexed_token(generate_accounts, tmp_path):
+    holders = generate_accounts(100)
+    token = IndexedERC20Token()
+    token.mint_many(holders, list(range(100)))
+
+    save_checkpoint(tmp_path / 'checkpoint', token)
+    restored, = load_checkpoint(tmp_path / 'checkpoint')
+
+    assert type(restored) is IndexedERC20Token
+    assert restored.total_supply == token.total_supply
+    assert dict(restored.balances) == dict(token.balances)
+
+
+def test_restore_into_registry(model, tmp_path):
+    save_checkpoint(tmp_path / 'checkpoint', *model)
+
+    with Registry() as registry:
+        governance, token, first, *_ = load_checkpoint(tmp_path / 'checkpoint')
+
+    assert registry[first.address] is first
+    assert Account.ACCOUNTS_STORAGE[first.address] is model[2]
+    assert len({a.index for a in registry.values()}) == len(registry)
+    assert first.index != model[2].index
+
+
+def test_restore_proposal_actions(model, tmp_path):
+    governance, _, first, _, tap = model
+    governance.create_proposal(
+        description='Add bucket',
+        exec_data=[ProposalAction(target=governance, method='add_bucket', args=(first,)),
+                   ProposalAction(target=tap, method='set_rate', kwargs={'new_rate': 5})])
+    save_checkpoint(tmp_path / 'checkpoint', *model)
+
+    governance, _, first, _, tap = load_checkpoint(tmp_path / 'checkpoint')
+    add_bucket, set_rate = governance.proposals[1].exec_data
+
+    assert (add_bucket.target, add_bucket.method, add_bucket.args) == (governance, 'add_bucket', (first,))
+    assert (set_rate.target, set_rate.kwargs) == (tap, {'new_rate': 5})
+
+
+def test_restore_action_arguments(model, tmp_path):
+    governance, _, _, _, tap = model
+    governance.create_proposal(
+        description='Restart tap',
+        exec_data=[ProposalAction(target=tap, method='activate', args=(datetime(2019, 2, 1),)),
+                   ProposalAction(target=tap, method='set_rate', args=(np.int64(3),))])
+    save_checkpoint(tmp_path / 'checkpoint', *model)
+
+    governance, *_ = load_checkpoint(tmp_path / 'checkpoint')
+    activate, set_rate = governance.proposals[1].exec_data
+
+    assert activate.args == (datetime(2019, 2, 1),)
+    assert set_rate.args == (3,) and type(set_rate.args[0]) is int
+
+
+def test_unsupported_action_argument(model, tmp_path):
+    governance, _, _, _, tap = model
+    save_checkpoint(tmp_path / 'checkpoint', *model)
+    governance.create_proposal(
+        description='Odd rate',
+        exec_data=ProposalAction(target=tap, method='set_rate', args=(object(),)))
+
+    with pytest.raises(UnsupportedCheckpoint):
+        save_checkpoint(tmp_path / 'checkpoint', *model)
+    assert not (tmp_path / 'checkpoint' / GRAPH_FILE).exists()
@@ -0,0 +1,103 @@
+import pytest
+
+from models.fork import fork, MAX_OVERLAY_DEPTH
+from models.ledger import BalancesOverlay, PAGE_BITS, PAGE_SIZE
+from models.tokens import ERC20Token, IndexedERC20Token
+
+
+def test_fork_is_independent(model):
+    governance, token, first, second, tap = model
+    f_governance, f_token, f_first, f_second, f_tap = fork(*model)
+
+    assert f_first.token is f_token
+    assert f_first.overflow_bkt is f_second
+    assert f_tap.bucket is f_first
+    assert f_tap.clock is f_first.clock is not first.clock
+    assert f_tap.withdrawer is tap.withdrawer
+    assert f_governance.founders == governance.founders
+
+    f_tap.clock.advance(100)
+    f_tap.set_rate(4)
+    f_tap.withdraw(400)
+    f_token.mint(f_first, 500)
+    f_first.flush()
+
+    assert f_token.balance_of(f_first) == 1000
+    assert f_token.balance_of(f_second) == 550
+    assert f_token.balance_of(tap.withdrawer) == 450
+    assert token.balance_of(first) == 950
+    assert token.balance_of(second) == 500
+    assert token.balance_of(tap.withdrawer) == 50
+    assert tap.rate == 2
+    assert first.clock.seconds == 100
+
+    f_proposal = f_governance.proposals[0]
+    f_proposal.poll.vote_for(governance.founders[4])
+    f_governance.finish_proposal_poll(f_proposal)
+    f_governance.execute_proposal(f_proposal)
+    assert f_proposal.poll.governance is f_governance
+    assert governance.proposals[0].poll.total_votes == 4
+    assert f_governance.buckets == [f_first]
+    assert governance.buckets == []
+
+
+def test_forks_share_unchanged_balances(model):
+    _, token, first, _, _ = model
+    forks = [fork(token, first) for _ in range(10)]
+
+    for f_token, f_first in forks:
+        f_token.mint(f_first, 10)
+
+    bases = {id(f_token.balances.base) for f_token, _ in forks}
+    assert len(bases) == 1
+    assert all(dict.__len__(f_token.balances) == 1 for f_token, _ in forks)
+    assert token.balance_of(first) == 950
+
+
+def test_overlays_are_compacted(model):
+    _, token, first, _, _ = model
+
+    for i in range(MAX_OVERLAY_DEPTH + 5):
+        token.mint(first, 1)
+        token, first = fork(token, first)
+
+    assert isinstance(token.balances, BalancesOverlay)
+    assert token.balances.depth <= MAX_OVERLAY_DEPTH
+    assert token.balance_of(first) == 950 + MAX_OVERLAY_DEPTH + 5
+
+
+@pytest.mark.parametrize('token_class', [ERC20Token, IndexedERC20Token])
+def test_fork_copies_on_write(generate_accounts, token_class):
+    holders = generate_accounts(3)
+    token = token_class()
+    token.mint_many(holders, [10, 20, 30])
+
+    f_token, = fork(token)
+    f_token.transfer(holders[0], holders[1], 5)
+    f_token.mint(holders[2], 1)
+
+    assert [token.balance_of(h) for h in holders] == [10, 20, 30]
+    assert [f_token.balance_of(h) for h in holders] == [5, 25, 31]
+    assert f_token.total_supply == token.total_supply + 1
+
+
+def test_indexed_forks_copy_written_pages(generate_accounts):
+    holders = generate_accounts(3 * PAGE_SIZE)
+    token = IndexedERC20Token()
+    token.mint_many(holders, [10] * len(holders))
+
+    f_token, = fork(token)
+    newcomer, = generate_accounts(1)
+    f_token.transfer(holders[0], holders[1], 5)
+    f_token.mint(newcomer, 1)
+
+    written = {a.index >> PAGE_BITS for a in (holders[0], holders[1], newcomer)}
+    allocated = {n for n, page in enumerate(token.balances.pages) if page is not None}
+    assert f_token.balances.shared == allocated - written
+    assert all(f_token.balances.pages[n] is token.balances.pages[n] for n in allocated - written)
+    assert all(f_token.balances.pages[n] is not token.balances.pages[n] for n in allocated & written)
+    assert [token.balance_of(h) for h in holders[:2]] == [10, 10]
+    assert [f_token.balance_of(h) for h in holders[:2]] == [5, 15]
+    assert newcomer.address in f_token.balances
+    assert newcomer.address not in token.balances
+    assert len(f_token.balances) == len(token.balances) + 1
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+import pytest
+
+from models.clock import SimulatedClock
+from models.dao import Bucket, Tap
+from models.simulation import Simulator
+
+
+@pytest.fixture
+def simulator():
+    return Simulator(SimulatedClock(datetime(2019, 1, 1)))
+
+
+@pytest.fixture
+def buckets(dai_stablecoin, simulator):
+    first = Bucket(
+        name='First',
+        withdraw_begin=datetime(2019, 1, 1),
+        token=dai_stablecoin,
+        max_volume=20000000,
+        clock=simulator.clock)
+    second = Bucket(
+        name='Second',
+        withdraw_begin=datetime(2019, 1, 1),
+        token=dai_stablecoin,
+        clock=simulator.clock)
+    first.set_overflow_bucket(second)
+
+    return first, second
+
+
+# Pay into bucket chain
+# Withdraw from tap monthly
+def test_payments_and_withdrawals(dai_stablecoin, simulator, buckets, account):
+    first, second = buckets
+    tap = Tap(withdrawer=account, bucket=first, rate=1, clock=simulator.clock)
+    tap.activate()
+    payments = [(datetime(2019, 1, 1) + timedelta(days=i), 250000) for i in range(150)]
+
+    simulator.schedule_payments(payments, dai_stablecoin, first)
+    simulator.schedule_every(
+        datetime(2019, 2, 1), timedelta(days=30), tap.withdraw_all, until=datetime(2019, 12, 31))
+    simulator.schedule_set_rate(datetime(2019, 6, 1), tap, 0)
+    simulator.run()
+
+    # the rate is set to 0 right before the withdrawal of June 1st
+    withdrawn = int((datetime(2019, 5, 2) - datetime(2019, 1, 1)).total_seconds())
+    assert simulator.clock.now() == datetime(2019, 12, 28)
+    assert dai_stablecoin.balance_of(account) == withdrawn
+    assert dai_stablecoin.balance_of(first) == 20000000
+    assert dai_stablecoin.balance_of(second) == 37500000 - 20000000 - withdrawn
+
+
+# Create Proposal for Tap activation
+# Vote for Proposal and execute it
+def test_proposal_lifecycle(governance, simulator, buckets, account):
+    tap = Tap(withdrawer=account, bucket=buckets[0], rate=1, clock=simulator.clock)
+
+    simulator.schedule_proposal(
+        datetime(2019, 3, 1), governance, 'Activate tap',
+        f"Account.ACCOUNTS_STORAGE['{tap.address}'].activate()",
+        votes_for=governance.founders, finish_at=datetime(2019, 3, 8))
+    simulator.run()
+
+    proposal = governance.proposals[0]
+    assert proposal.executed
+    assert tap.active
+    assert tap.last_withdraw == datetime(2019, 3, 8)
@@ -1,7 +1,7 @@
 from datetime import datetime
 import pytest
 
-from models.dao import Bucket, Tap
+from models.dao import Bucket, Tap, ProposalAction
 
 
 @pytest.fixture
@@ -54,3 +54,24 @@ def test_vote_against_activate_tap(governance, bucket, account):
     assert not proposal.accepted
     assert not proposal.executed
     assert not tap.active
+
+
+def test_vote_for_proposal_actions(governance, bucket, account):
+    tap = Tap(
+        withdrawer=account, bucket=bucket, description='development', rate=1)
+
+    proposal = governance.create_proposal(
+        description='Add bucket and activate tap',
+        exec_data=[
+            ProposalAction(target=governance, method='add_bucket', args=(bucket,)),
+            ProposalAction(target=tap, method='activate'),
+        ])
+
+    for f in governance.founders:
+        proposal.poll.vote_for(f)
+    governance.finish_proposal_poll(proposal)
+    governance.execute_proposal(proposal)
+
+    assert proposal.executed
+    assert governance.buckets == [bucket]
+    assert tap.active
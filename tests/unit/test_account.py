@@ -1,3 +1,6 @@
+import weakref
+
+
 def test_address_generation(account):
     assert len(account.address) == 42
     assert account.address[0:2] == '0x'
@@ -8,3 +11,14 @@ def test_address_generation(account):
 
 def test_string_representation(account):
     assert str(account) == f'Account {account.address}'
+
+
+def test_index_generation(generate_accounts):
+    first, second = generate_accounts(2)
+
+    assert second.index == first.index + 1
+
+
+def test_slotted_instances(account):
+    assert not hasattr(account, '__dict__')
+    assert weakref.ref(account)() is account
@@ -1,7 +1,8 @@
 from datetime import datetime, timedelta
 import pytest
 
-from models.dao import Bucket
+from models.clock import SimulatedClock
+from models.dao import Bucket, OverflowCycleError
 
 
 @pytest.fixture
@@ -90,6 +91,83 @@ def test_child_overflow_flush(dai_stablecoin, coupled_buckets):
     assert dai_stablecoin.balance_of(child) == 4000
 
 
+@pytest.fixture
+def long_chain(build_chain, dai_stablecoin):
+    return build_chain([10] * 3000, token=dai_stablecoin)[1]
+
+
+def test_long_chain_flush(dai_stablecoin, long_chain):
+    dai_stablecoin.mint(long_chain[0], 40000)
+
+    long_chain[0].flush()
+
+    assert dai_stablecoin.balance_of(long_chain[0]) == 10
+    assert dai_stablecoin.balance_of(long_chain[-2]) == 10
+    assert dai_stablecoin.balance_of(long_chain[-1]) == 40000 - 2999 * 10
+
+
+def test_overflow_chain(coupled_buckets):
+    parent, child = coupled_buckets
+
+    assert parent.overflow_chain() == [parent, child]
+    assert child.overflow_chain() == [child]
+
+
+def test_overflow_cycle(coupled_buckets):
+    parent, child = coupled_buckets
+
+    with pytest.raises(OverflowCycleError):
+        child.set_overflow_bucket(parent)
+
+    with pytest.raises(OverflowCycleError):
+        parent.set_overflow_bucket(parent)
+
+    assert child.overflow_bkt is None
+
+
+def test_flush_stops_without_excess(dai_stablecoin, long_chain):
+    dai_stablecoin.mint(long_chain[2], 50)
+
+    long_chain[0].flush()
+
+    assert dai_stablecoin.balance_of(long_chain[2]) == 50
+
+
+def test_flush_changed_only(dai_stablecoin, long_chain):
+    dai_stablecoin.track_changes()
+    dai_stablecoin.mint(long_chain[0], 15)
+    dai_stablecoin.mint(long_chain[2], 50)
+
+    long_chain[0].flush(changed_only=True)
+
+    assert [dai_stablecoin.balance_of(b) for b in long_chain[:8]] == [10, 5, 10, 10, 10, 10, 10, 0]
+    assert dai_stablecoin.changed == set()
+
+
+def test_flush_changed_only_wo_tracking(dai_stablecoin, long_chain):
+    dai_stablecoin.mint(long_chain[2], 25)
+
+    long_chain[0].flush(changed_only=True)
+
+    assert [dai_stablecoin.balance_of(b) for b in long_chain[:5]] == [0, 0, 10, 10, 5]
+    assert dai_stablecoin.changed == set()
+
+
+def test_changes_track_only_buckets(dai_stablecoin, long_chain, generate_accounts):
+    dai_stablecoin.track_changes()
+    holders = generate_accounts(3)
+    dai_stablecoin.mint(long_chain[0], 15)
+    for holder in holders:
+        dai_stablecoin.transfer(long_chain[0], holder, 1)
+    dai_stablecoin.mint_many(holders, [5, 5, 5])
+
+    assert dai_stablecoin.changed == {long_chain[0].address}
+
+    long_chain[0].flush(changed_only=True)
+
+    assert dai_stablecoin.changed == set()
+
+
 def test_successful_withdraw(account, dai_stablecoin):
     bucket = Bucket(
         name='Test bucket',
@@ -131,3 +209,21 @@ def test_withdraw_too_much(account, dai_stablecoin):
 
     assert dai_stablecoin.balance_of(bucket) == 1000
     assert dai_stablecoin.balance_of(account) == 0
+
+
+def test_withdraw_w_simulated_clock(account, dai_stablecoin):
+    clock = SimulatedClock(datetime(2019, 1, 1))
+    bucket = Bucket(
+        name='Test bucket',
+        withdraw_begin=datetime(2019, 1, 2),
+        token=dai_stablecoin,
+        max_volume=1000,
+        clock=clock)
+    dai_stablecoin.mint(bucket, 1000)
+
+    bucket.withdraw(account, 700)
+    assert dai_stablecoin.balance_of(account) == 0
+
+    clock.advance(86400)
+    bucket.withdraw(account, 700)
+    assert dai_stablecoin.balance_of(account) == 700
@@ -0,0 +1,34 @@
+from datetime import datetime, timedelta
+import pytest
+
+from models.clock import SYSTEM_CLOCK, SimulatedClock
+
+
+@pytest.mark.freeze_time
+def test_system_clock():
+    assert SYSTEM_CLOCK.now() == datetime.now()
+
+
+def test_simulated_clock():
+    clock = SimulatedClock(datetime(2019, 1, 1))
+
+    assert clock.now() == datetime(2019, 1, 1)
+
+    clock.advance(86400)
+    assert clock.now() == datetime(2019, 1, 2)
+    assert clock.seconds == 86400
+
+
+def test_simulated_clock_move_to():
+    clock = SimulatedClock(datetime(2019, 1, 1))
+    clock.move_to(datetime(2019, 1, 1) + timedelta(hours=1))
+
+    assert clock.seconds == 3600
+    assert clock.now() == datetime(2019, 1, 1, 1)
+
+
+def test_simulated_clock_timestamp():
+    clock = SimulatedClock(datetime(1970, 1, 2))
+    clock.advance(5)
+
+    assert clock.timestamp() == 86405
@@ -1,6 +1,7 @@
 import pytest
 from models.dao import Governance, AccountNotFounder, \
-    TokenIsNotSet, PollCantBeFinished, ConsesusNotReached, CantExecutreProposal
+    TokenIsNotSet, PollCantBeFinished, ConsesusNotReached, CantExecutreProposal, \
+    InvalidProposalAction, ProposalAction, compile_exec_data
 from models.helpers import InvalidStateError
 
 
@@ -82,6 +83,51 @@ def test_successful_mint_to_founder(governance):
     assert governance.total_staked == 1000
 
 
+def test_successful_mint_to_founders(governance):
+    governance.mint_to_founders(governance.founders, [1000, 2000, 3000])
+    governance.mint_to_founders(governance.founders[:1], [500])
+
+    assert [governance.token.balance_of(f) for f in governance.founders] == [1500, 2000, 3000]
+    assert governance.staked_tokens[governance.founders[0]] == 1500
+    assert governance.total_staked == 6500
+    assert governance.total_stakers == 3
+
+
+def test_founders_from_generator(generate_accounts, tinges_token):
+    founders = generate_accounts(2)
+    governance = Governance(
+        organization_name='Tinges',
+        founders=(f for f in founders),
+        min_involv_prcnt=50,
+        min_cons_vote_prcnt=80)
+    governance.set_token(tinges_token)
+
+    governance.mint_to_founder(founders[1], 1000)
+    assert list(governance.founders) == founders
+    assert governance.total_staked == 1000
+
+
+def test_stakes_are_read_only(governance, account):
+    governance.founders = [*governance.founders, account]
+    governance.mint_to_founder(account, 1000)
+
+    with pytest.raises(TypeError):
+        governance.staked_tokens[account] = 0
+
+    stakes = {account: 10}
+    governance.staked_tokens = stakes
+    stakes[account] = 20
+    assert governance.total_staked == 10 == governance.staked_tokens[account]
+
+
+def test_mint_to_founders_not_founder(governance, account):
+    with pytest.raises(AccountNotFounder):
+        governance.mint_to_founders([governance.founders[0], account], [1000, 1000])
+
+    assert governance.total_staked == 0
+    assert governance.token.balance_of(governance.founders[0]) == 0
+
+
 def test_mint_to_not_founder(governance, account):
     with pytest.raises(AccountNotFounder):
         governance.mint_to_founder(account, 1000)
@@ -170,6 +216,70 @@ def test_various_vote_weight_calculcation(governance):
     assert proposal.accepted
 
 
+def test_running_poll_tallies(governance):
+    rich_founder, *other_founders = governance.founders
+
+    governance.mint_to_founder(rich_founder, 8500)
+    for f in other_founders:
+        governance.mint_to_founder(f, 1000)
+    governance.finish_genesis()
+    proposal = governance.create_proposal(
+        description='Test proposal', exec_data='self.foo="bar"')
+    proposal.poll.vote_for(rich_founder)
+    proposal.poll.vote_against(other_founders[0])
+
+    assert proposal.poll.tokens_for == 8500
+    assert proposal.poll.tokens_against == 1000
+    assert proposal.poll.voters == {rich_founder, other_founders[0]}
+
+
+def test_vote_many_tallies(governance, account):
+    rich_founder, *other_founders = governance.founders
+
+    governance.mint_to_founder(rich_founder, 8500)
+    for f in other_founders:
+        governance.mint_to_founder(f, 1000)
+    governance.finish_genesis()
+    proposal = governance.create_proposal(
+        description='Test proposal', exec_data='self.foo="bar"')
+
+    assert proposal.poll.vote_many([rich_founder, account], in_favor=True) == [account]
+    assert proposal.poll.vote_many(governance.founders, in_favor=False) == [rich_founder]
+    assert proposal.poll.tokens_for == 8500
+    assert proposal.poll.tokens_against == 2000
+
+    governance.finish_proposal_poll(proposal)
+    assert proposal.accepted
+
+
+def test_votes_weighted_by_snapshot(governance):
+    rich_founder, *other_founders = governance.founders
+
+    governance.mint_to_founder(rich_founder, 8500)
+    for f in other_founders:
+        governance.mint_to_founder(f, 1000)
+    governance.finish_genesis()
+    proposal = governance.create_proposal(
+        description='Test proposal', exec_data='self.foo="bar"')
+
+    governance.set_state('Genesis')
+    for f in other_founders:
+        governance.mint_to_founder(f, 10000)
+    governance.set_state('Private')
+
+    assert proposal.snapshot == proposal.poll.snapshot
+    assert governance.stake_at(other_founders[0], proposal.snapshot) == 1000
+    assert governance.stake_at(other_founders[0], None) == 11000
+    assert governance.totals_at(proposal.snapshot) == (10500, 3)
+
+    proposal.poll.vote_for(rich_founder)
+    for f in other_founders:
+        proposal.poll.vote_against(f)
+    governance.finish_proposal_poll(proposal)
+
+    assert proposal.accepted
+
+
 def test_finish_proposal_not_invlolved(governance_w_proposal):
     proposal = governance_w_proposal.proposals[0]
     proposal.poll.vote_for(governance_w_proposal.founders[0])
@@ -264,3 +374,54 @@ def test_execute_proposal_w_wrong_state(governance_w_proposal):
         governance_w_proposal.execute_proposal(proposal)
 
     assert not hasattr(governance_w_proposal, 'foo')
+
+
+def test_execute_proposal_action(governance_w_proposal, dai_stablecoin, account):
+    action = ProposalAction(target=dai_stablecoin, method='mint', args=(account, 100))
+    proposal = governance_w_proposal.create_proposal(description='Mint', exec_data=action)
+    for f in governance_w_proposal.founders:
+        proposal.poll.vote_for(f)
+    governance_w_proposal.finish_proposal_poll(proposal)
+
+    governance_w_proposal.execute_proposal(proposal)
+
+    assert proposal.executed
+    assert dai_stablecoin.balance_of(account) == 100
+
+
+def test_invalid_proposal_action(governance_w_proposal, dai_stablecoin, account):
+    with pytest.raises(InvalidProposalAction):
+        ProposalAction(target=dai_stablecoin, method='transfer', args=(account, account, 1))
+
+    with pytest.raises(InvalidProposalAction):
+        ProposalAction(target=dai_stablecoin, method='burn')
+
+    with pytest.raises(InvalidProposalAction):
+        governance_w_proposal.create_proposal(description='Mint', exec_data=[account])
+
+    with pytest.raises(SyntaxError):
+        governance_w_proposal.create_proposal(description='Broken', exec_data='self.foo=')
+
+
+def test_execute_proposals(governance_w_proposal, dai_stablecoin, account):
+    proposals = [governance_w_proposal.proposals[0]] + [
+        governance_w_proposal.create_proposal(
+            description='Mint',
+            exec_data=[ProposalAction(target=dai_stablecoin, method='mint', args=(account, 10))] * 2)
+        for _ in range(3)
+    ]
+    for proposal in proposals:
+        for f in governance_w_proposal.founders:
+            proposal.poll.vote_for(f)
+        governance_w_proposal.finish_proposal_poll(proposal)
+
+    with pytest.raises(CantExecutreProposal):
+        governance_w_proposal.execute_proposals(proposals + proposals[:1])
+    assert not any(p.executed for p in proposals)
+
+    governance_w_proposal.execute_proposals(proposals)
+
+    assert all(p.executed for p in proposals)
+    assert governance_w_proposal.foo == 'bar'
+    assert dai_stablecoin.balance_of(account) == 60
+    assert compile_exec_data.cache_info().currsize >= 1
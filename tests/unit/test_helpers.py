@@ -0,0 +1,216 @@
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+import pytest
+
+from helpers import generate_random_payments, cascade_fill_levels, process_ingress_payments, \
+    process_ingress_payments_batch, iter_random_payments, iter_ingress_chunks, \
+    write_chunks_csv, convert_to_df, generate_payments_array, PeriodRecorder, PERIOD_FREQS, \
+    record_ingress_periods, process_ingress_columns
+
+
+@pytest.fixture
+def payments():
+    start = datetime(2019, 1, 1)
+    amounts = [700, 300, 1200, 50, 5000, 1, 999, 2500]
+    return ['date', 'income'], [[start + timedelta(hours=i), a] for i, a in enumerate(amounts)]
+
+
+def copy_payments(payments):
+    return list(payments[0]), [list(p) for p in payments[1]]
+
+
+def test_cascade_fill_levels():
+    levels = cascade_fill_levels([500, 700, 2000], [1000, 1000, 1000])
+
+    assert levels.tolist() == [[500, 0, 0], [1000, 200, 0], [1000, 1000, 1200]]
+
+
+def test_cascade_fill_levels_w_initial_balances():
+    levels = cascade_fill_levels([500, 700], [1000, 1000], initial=[800, 100])
+
+    assert levels.tolist() == [[1000, 400], [1000, 1100]]
+
+
+@pytest.mark.parametrize('volumes', [[1000, 2000, 3000], [10, 20], [100000]])
+def test_batch_matches_loop(payments, volumes, build_chain):
+    token, buckets = build_chain(volumes)
+    expected = process_ingress_payments(copy_payments(payments), token, *buckets)
+
+    batch_token, batch_buckets = build_chain(volumes)
+    result = process_ingress_payments_batch(copy_payments(payments), batch_token, *batch_buckets)
+
+    assert result == expected
+    assert [batch_token.balance_of(b) for b in batch_buckets] == \
+        [token.balance_of(b) for b in buckets]
+
+
+def test_batch_w_prefilled_chain(payments, build_chain):
+    token, buckets = build_chain([1000, 2000, 3000])
+    token.mint(buckets[0], 2500)
+    expected = process_ingress_payments(copy_payments(payments), token, *buckets)
+
+    batch_token, batch_buckets = build_chain([1000, 2000, 3000])
+    batch_token.mint(batch_buckets[0], 2500)
+    result = process_ingress_payments_batch(copy_payments(payments), batch_token, *batch_buckets)
+
+    assert result == expected
+
+
+def test_batch_w_overfilled_middle_bucket(build_chain):
+    payments = ['date', 'income'], [[datetime(2019, 1, 1), 1500]]
+    token, buckets = build_chain([1000, 100, 10 ** 9])
+    token.mint(buckets[1], 500)
+    expected = process_ingress_payments(copy_payments(payments), token, *buckets)
+
+    batch_token, batch_buckets = build_chain([1000, 100, 10 ** 9])
+    batch_token.mint(batch_buckets[1], 500)
+    result = process_ingress_payments_batch(copy_payments(payments), batch_token, *batch_buckets)
+
+    assert result == expected
+    assert [row[2:] for row in result[1]] == [[1000, 100, 900]]
+    assert [batch_token.balance_of(b) for b in batch_buckets] == [1000, 100, 900]
+
+
+def test_generate_random_payments():
+    column_names, payments = generate_random_payments(value=100000)
+    dates = [p[0] for p in payments]
+
+    assert column_names == ['date', 'income']
+    assert sum(p[1] for p in payments) == 100000
+    assert dates == sorted(dates)
+
+
+def test_iter_random_payments():
+    date_range = (datetime(2019, 1, 1), datetime(2019, 2, 1))
+    payments = list(iter_random_payments(date_range=date_range, value=100000, seed=42))
+    dates = [p[0] for p in payments]
+
+    assert sum(p[1] for p in payments) == 100000
+    assert dates == sorted(dates)
+    assert date_range[0] <= dates[0] and dates[-1] <= date_range[1]
+    assert payments == list(iter_random_payments(date_range=date_range, value=100000, seed=42))
+
+
+def test_iter_ingress_chunks(payments, build_chain):
+    token, buckets = build_chain([1000, 2000, 3000])
+    expected = convert_to_df(process_ingress_payments(copy_payments(payments), token, *buckets))
+
+    stream_token, stream_buckets = build_chain([1000, 2000, 3000])
+    chunks = list(iter_ingress_chunks(
+        copy_payments(payments)[1], stream_token, *stream_buckets, chunk_size=3))
+
+    assert [len(c) for c in chunks] == [3, 3, 2]
+    pd.testing.assert_frame_equal(pd.concat(chunks), expected)
+
+
+def test_write_chunks_csv(payments, tmp_path, build_chain):
+    token, buckets = build_chain([1000, 2000])
+    chunks = iter_ingress_chunks(copy_payments(payments)[1], token, *buckets, chunk_size=3)
+    path = tmp_path / 'payments.csv'
+
+    assert write_chunks_csv(chunks, path) == 8
+
+    df = pd.read_csv(path, index_col='date')
+    assert list(df.columns) == ['income', 'bkt_0', 'bkt_1']
+    assert df.income.sum() == sum(p[1] for p in payments[1])
+
+
+@pytest.mark.parametrize('distribution', ['uniform', 'lognormal', 'whale'])
+def test_generate_payments_array(distribution):
+    date_range = (datetime(2019, 1, 1), datetime(2019, 7, 1))
+    dates, amounts = generate_payments_array(
+        date_range=date_range, value=1000000, seed=7, distribution=distribution)
+
+    assert dates.dtype == np.dtype('datetime64[s]')
+    assert amounts.dtype == np.int64
+    assert len(dates) == len(amounts)
+    assert amounts.sum() == 1000000
+    assert (amounts[:-1] >= 100).all() and (amounts <= 10000).all()
+    assert (np.diff(dates) >= np.timedelta64(0, 's')).all()
+    assert dates[0] >= np.datetime64(date_range[0]) and dates[-1] <= np.datetime64(date_range[1])
+
+
+def test_generate_payments_array_is_seeded():
+    first = generate_payments_array(value=100000, seed=np.random.default_rng(3))
+    second = generate_payments_array(value=100000, seed=3)
+
+    assert (first[0] == second[0]).all()
+    assert (first[1] == second[1]).all()
+
+
+def test_generate_payments_array_unknown_distribution():
+    with pytest.raises(ValueError):
+        generate_payments_array(distribution='bimodal')
+
+
+@pytest.mark.parametrize('freq', ['D', 'W', 'M'])
+def test_record_ingress_periods(freq, build_chain):
+    dates, amounts = generate_payments_array(
+        date_range=(datetime(2019, 1, 1), datetime(2019, 6, 1)), value=300000, seed=1)
+    token, buckets = build_chain([50000, 100000, 1000000])
+    rows = convert_to_df(process_ingress_payments_batch(
+        (['date', 'income'], [[d, a] for d, a in zip(dates.tolist(), amounts.tolist())]),
+        token, *buckets))
+    aggregation = {'income': 'sum', **{b.name: 'last' for b in buckets}}
+    expected = rows.groupby(rows.index.to_period(PERIOD_FREQS[freq])).agg(aggregation)
+
+    chunked_token, chunked_buckets = build_chain([50000, 100000, 1000000])
+    result = record_ingress_periods(
+        (dates, amounts), chunked_token, *chunked_buckets, freq=freq, chunk_size=7)
+
+    assert list(result.columns) == ['income', 'bkt_0', 'bkt_1', 'bkt_2']
+    assert result.index.freqstr == PERIOD_FREQS[freq]
+    pd.testing.assert_frame_equal(result.loc[expected.index], expected, check_names=False)
+    assert result.income.sum() == 300000
+
+
+def test_record_ingress_periods_fills_gaps(build_chain):
+    payments = [[datetime(2019, 1, 5), 100], [datetime(2019, 1, 20), 200], [datetime(2019, 4, 2), 50]]
+    token, buckets = build_chain([250, 1000])
+
+    result = record_ingress_periods(payments, token, *buckets, chunk_size=2)
+
+    assert [str(p) for p in result.index] == ['2019-01', '2019-02', '2019-03', '2019-04']
+    assert result.values.tolist() == [[300, 250, 50], [0, 250, 50], [0, 250, 50], [50, 250, 100]]
+
+
+def test_period_recorder_requires_time_order():
+    recorder = PeriodRecorder(['bkt'], freq='D')
+    recorder.record(np.array(['2019-01-02'], dtype='datetime64[s]'), [1], [[1]])
+
+    with pytest.raises(ValueError):
+        recorder.record(np.array(['2019-01-01'], dtype='datetime64[s]'), [1], [[2]])
+
+    assert PeriodRecorder(['bkt']).to_frame().empty
+
+
+def test_process_ingress_columns(payments, build_chain):
+    token, buckets = build_chain([1000, 2000, 3000])
+    expected = convert_to_df(process_ingress_payments(copy_payments(payments), token, *buckets))
+
+    columns_token, columns_buckets = build_chain([1000, 2000, 3000])
+    rows = copy_payments(payments)[1]
+    result = process_ingress_columns(iter(rows), columns_token, *columns_buckets, chunk_size=3)
+    df = convert_to_df(result)
+
+    assert len(result) == len(rows)
+    assert result.column_names == ['date', 'income', 'bkt_0', 'bkt_1', 'bkt_2']
+    pd.testing.assert_frame_equal(df, expected, check_index_type=False)
+    assert np.shares_memory(df['bkt_1'].to_numpy(), result.balances)
+    assert np.shares_memory(df.index.values, result.dates)
+    assert rows == copy_payments(payments)[1]
+
+
+def test_ingress_result_files(tmp_path, build_chain):
+    dates, amounts = generate_payments_array(value=100000, seed=1)
+    token, buckets = build_chain([20000, 50000])
+    result = process_ingress_columns((dates, amounts), token, *buckets)
+
+    result.to_parquet(tmp_path / 'payments.parquet')
+    result.to_feather(tmp_path / 'payments.feather')
+
+    pd.testing.assert_frame_equal(
+        pd.read_parquet(tmp_path / 'payments.parquet'), result.to_df(), check_index_type=False)
+    pd.testing.assert_frame_equal(
+        pd.read_feather(tmp_path / 'payments.feather').set_index('date'), result.to_df())
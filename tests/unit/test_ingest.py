@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from helpers import generate_payments_array, process_ingress_columns, record_ingress_periods, \
+    IngressResult, PeriodRecorder
+from ingest import ingest_payments, iter_payment_file, PaymentFileError
+
+
+@pytest.fixture
+def payments():
+    return generate_payments_array(value=500000, seed=7)
+
+
+@pytest.fixture
+def csv_file(payments, tmp_path):
+    path = tmp_path / 'payments.csv'
+    pd.DataFrame({'date': payments[0], 'income': payments[1]}).to_csv(path, index=False)
+    return path
+
+
+def test_ingest_csv(payments, csv_file, build_chain):
+    token, buckets = build_chain([100000, 200000])
+    expected = record_ingress_periods(payments, token, *buckets)
+
+    ingest_token, ingest_buckets = build_chain([100000, 200000])
+    recorder = PeriodRecorder([b.name for b in ingest_buckets])
+    reported = []
+    stats = ingest_payments(
+        csv_file, ingest_token, *ingest_buckets, sink=recorder.record,
+        progress=lambda s: reported.append(s.rows), chunk_size=25)
+
+    assert stats.rows == len(payments[0])
+    assert stats.chunks == len(reported) == -(-len(payments[0]) // 25)
+    assert reported[0] == 25
+    assert stats.rows_per_second > 0
+    pd.testing.assert_frame_equal(recorder.to_frame(), expected)
+
+
+def test_ingest_parquet(payments, tmp_path, build_chain):
+    token, buckets = build_chain([100000, 200000])
+    expected = process_ingress_columns(payments, token, *buckets)
+    expected.to_parquet(tmp_path / 'payments.parquet')
+
+    ingest_token, ingest_buckets = build_chain([100000, 200000])
+    result = IngressResult([b.name for b in ingest_buckets])
+    ingest_payments(tmp_path / 'payments.parquet', ingest_token, *ingest_buckets,
+                    sink=result.append, chunk_size=30)
+
+    pd.testing.assert_frame_equal(result.to_df(), expected.to_df())
+
+
+@pytest.mark.parametrize('rows, message', [
+    ('2019-01-02,10\n2019-01-01,10\n', 'time order'),
+    ('2019-01-01,10\n2019-01-02,10\n2019-01-03,10\n2019-01-02,10\n', 'time order'),
+    ('2019-01-01,10.5\n', 'integers'),
+    ('2019-01-01,\n', 'missing'),
+    ('2019-01-01,-1\n', 'negative'),
+    ('yesterday,10\n', 'invalid date'),
+])
+def test_invalid_payment_files(tmp_path, rows, message):
+    path = tmp_path / 'payments.csv'
+    path.write_text('date,income\n' + rows)
+
+    with pytest.raises(PaymentFileError, match=message):
+        list(iter_payment_file(path, chunk_size=2))
+
+
+def test_payment_file_types(csv_file, payments):
+    dates, amounts = next(iter_payment_file(csv_file, chunk_size=10))
+
+    assert dates.dtype == np.dtype('datetime64[s]')
+    assert amounts.dtype == np.int64
+    assert (dates == payments[0][:10]).all()
+
+    with pytest.raises(PaymentFileError):
+        next(iter_payment_file(str(csv_file).replace('.csv', '.json')))
@@ -0,0 +1,111 @@
+import json
+from datetime import datetime
+import pytest
+
+from models.account import Account
+from models.checkpoint import load_checkpoint, save_checkpoint
+from models.dao import Governance
+from models.instrumentation import Instrumentation, instrumented_base
+from models.registry import Registry
+from models.tokens import ERC20Token, TingesToken
+
+
+@pytest.fixture
+def chain(build_chain):
+    return build_chain([100] * 3, withdraw_begin=datetime(2019, 1, 1))
+
+
+def test_counts_calls_and_flush_depth(chain):
+    token, buckets = chain
+    instrumentation = Instrumentation()
+    instrumentation.attach(token, *buckets)
+
+    for amount in [50, 100, 100, 50]:
+        token.mint(buckets[0], amount)
+        buckets[0].flush()
+
+    summary = instrumentation.summary()
+    assert summary.loc['ERC20Token.mint', 'calls'] == 4
+    assert summary.loc['ERC20Token.transfer', 'calls'] == 5
+    assert summary.loc['Bucket.flush', 'calls'] == 4
+    assert (summary.seconds > 0).all()
+    assert instrumentation.histograms['Bucket.flush'] == {0: 1, 1: 1, 2: 2}
+    assert 'Bucket.flush histogram' in instrumentation.report()
+    assert token.balance_of(buckets[2]) == 100
+
+
+def test_attach_and_detach(chain, account):
+    token, buckets = chain
+    instrumentation = Instrumentation()
+    instrumentation.attach(token, account)
+
+    assert isinstance(token, ERC20Token)
+    assert type(token) is not ERC20Token
+    assert instrumented_base(type(token)) is ERC20Token
+    assert type(account) is Account
+    assert token.mint.caller_name == 'Governance'
+
+    instrumentation.detach(token)
+    token.mint(buckets[0], 10)
+
+    assert type(token) is ERC20Token
+    assert 'ERC20Token.mint' not in instrumentation.summary().index
+
+
+def test_governance_poll_methods(generate_accounts):
+    with Registry() as registry:
+        founders = generate_accounts(3)
+        governance = Governance(
+            organization_name='Tinges', founders=founders, min_involv_prcnt=50,
+            min_cons_vote_prcnt=80)
+        governance.set_token(TingesToken())
+        governance.mint_to_founders(founders, [1000] * 3)
+        governance.finish_genesis()
+        proposal = governance.create_proposal(description='Test', exec_data='pass')
+
+    instrumentation = Instrumentation()
+    instrumentation.attach(*registry.values())
+    proposal.poll.vote_many(founders[:2], in_favor=True)
+    proposal.poll.vote_for(founders[2])
+    governance.finish_proposal_poll(proposal)
+
+    summary = instrumentation.summary()
+    assert summary.loc['Governance.finish_proposal_poll', 'calls'] == 1
+    assert summary.loc['Governance.register_vote', 'calls'] == 1
+    assert summary.loc['Governance.register_votes', 'calls'] == 1
+    assert summary.loc['Poll.vote_many', 'calls'] == 1
+    assert proposal.accepted
+
+
+def test_write_trace(chain, tmp_path):
+    token, buckets = chain
+    instrumentation = Instrumentation(trace=True)
+    instrumentation.attach(token, *buckets)
+
+    token.mint(buckets[0], 150)
+    buckets[0].flush()
+    instrumentation.write_trace(tmp_path / 'trace.json')
+
+    with open(tmp_path / 'trace.json') as f:
+        events = json.load(f)['traceEvents']
+    assert [e['name'] for e in events] == ['ERC20Token.mint', 'ERC20Token.transfer', 'Bucket.flush']
+    assert events[2]['ts'] <= events[1]['ts'] and events[2]['dur'] >= events[1]['dur']
+    assert all(e['ph'] == 'X' for e in events)
+
+    instrumentation.reset()
+    assert instrumentation.summary().empty
+    assert not instrumentation.events
+
+
+def test_checkpoint_of_attached_objects(chain, tmp_path):
+    token, buckets = chain
+    Instrumentation().attach(token, *buckets)
+    token.mint(buckets[0], 150)
+    buckets[0].flush()
+
+    with Registry():
+        save_checkpoint(tmp_path / 'model.npz', token)
+        restored, = load_checkpoint(tmp_path / 'model.npz')
+
+    assert type(restored) is ERC20Token
+    assert restored.total_supply == 150
@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+
+from models.clock import SimulatedClock
+from models.dao import Bucket, Tap
+from models.journal import Journal, MINT, TRANSFER
+
+
+@pytest.fixture
+def clock():
+    return SimulatedClock(datetime(2019, 1, 1))
+
+
+@pytest.fixture
+def journal(clock):
+    return Journal(clock=clock, chunk_size=4)
+
+
+def test_journal_creation(journal):
+    df = journal.to_dataframe()
+
+    assert len(journal) == 0
+    assert list(df.columns) == ['time', 'event', 'emitter', 'frm', 'to', 'amount']
+    assert df.empty
+
+
+def test_record(journal, clock):
+    journal.record(MINT, 1, -1, 2, 100)
+    clock.advance(60)
+    journal.record(TRANSFER, 1, 2, 3, 40)
+
+    df = journal.to_dataframe()
+
+    assert len(journal) == 2
+    assert df.time.tolist() == [datetime(2019, 1, 1), datetime(2019, 1, 1, 0, 1)]
+    assert df.event.tolist() == ['Mint', 'Transfer']
+    assert df.frm.tolist() == [-1, 2]
+    assert df.amount.tolist() == [100, 40]
+
+
+def test_single_chunk_export_shares_memory(journal):
+    journal.record(MINT, 1, -1, 2, 100)
+
+    df = journal.to_dataframe()
+
+    assert np.shares_memory(df.amount.to_numpy(), journal.chunks[0]['amount'])
+
+
+def test_record_many_spans_chunks(journal):
+    journal.record(MINT, 1, -1, 2, 100)
+    journal.record_many(TRANSFER, 1, 2, np.arange(10), np.arange(10) * 10)
+
+    df = journal.to_dataframe()
+
+    assert len(journal.chunks) == 3
+    assert [len(f) for f in journal.iter_frames()] == [4, 4, 3]
+    assert df.to.tolist() == [2] + list(range(10))
+    assert df.amount.tolist() == [100] + list(range(0, 100, 10))
+
+
+def test_contract_events(dai_stablecoin, journal, clock, account):
+    first = Bucket(name='First', withdraw_begin=datetime(2019, 1, 1), token=dai_stablecoin,
+                   max_volume=1000, clock=clock)
+    second = Bucket(name='Second', withdraw_begin=datetime(2019, 1, 1), token=dai_stablecoin,
+                    clock=clock)
+    first.set_overflow_bucket(second)
+    tap = Tap(withdrawer=account, bucket=first, rate=1, clock=clock)
+    journal.attach(dai_stablecoin, first, second, tap)
+
+    dai_stablecoin.mint(first, 1500)
+    first.flush()
+    tap.activate()
+    clock.advance(100)
+    tap.withdraw_all()
+    tap.set_rate(2)
+
+    df = journal.to_dataframe()
+    assert df.event.tolist() == \
+        ['Mint', 'Transfer', 'Overflow', 'Transfer', 'Withdraw', 'TapWithdraw', 'RateChange']
+    assert df.iloc[2][['emitter', 'frm', 'to', 'amount']].tolist() == \
+        [first.index, first.index, second.index, 500]
+    assert df.iloc[5][['emitter', 'frm', 'to', 'amount']].tolist() == \
+        [tap.index, first.index, account.index, 100]
+    assert df.time.iloc[-1] == datetime(2019, 1, 1) + timedelta(seconds=100)
+
+
+def test_refused_tap_withdraw_is_not_recorded(dai_stablecoin, journal, clock, account):
+    bucket = Bucket(name='Late', withdraw_begin=datetime(2019, 2, 1), token=dai_stablecoin,
+                    clock=clock)
+    tap = Tap(withdrawer=account, bucket=bucket, rate=1, clock=clock)
+    journal.attach(bucket, tap)
+    dai_stablecoin.mint(bucket, 1000)
+    tap.activate()
+    clock.advance(50)
+
+    tap.withdraw(50)
+
+    assert dai_stablecoin.balance_of(account) == 0
+    assert len(journal) == 0
+
+
+def test_token_batch_events(tinges_token, journal, generate_accounts):
+    accounts = generate_accounts(3)
+    journal.attach(tinges_token)
+
+    tinges_token.mint_many(accounts, [10, 20, 30])
+
+    df = journal.to_dataframe()
+    assert df.event.tolist() == ['Mint'] * 3
+    assert df.to.tolist() == [a.index for a in accounts]
@@ -0,0 +1,56 @@
+from datetime import datetime
+import numpy as np
+import pytest
+
+from models.account import Account
+from montecarlo import BucketSpec, ScenarioSpec, run_scenario, run_monte_carlo
+
+
+@pytest.fixture
+def spec():
+    return ScenarioSpec(
+        buckets=[
+            BucketSpec(name='bkt_01', max_volume=100000),
+            BucketSpec(name='bkt_02', max_volume=200000),
+            BucketSpec(name='bkt_03')],
+        date_range=(datetime(2019, 1, 1), datetime(2019, 4, 1)),
+        value=500000)
+
+
+def test_scenario_build(spec):
+    token, buckets = spec.build()
+
+    assert [b.name for b in buckets] == ['bkt_01', 'bkt_02', 'bkt_03']
+    assert all(b.token == token for b in buckets)
+    assert buckets[0].overflow_bkt == buckets[1]
+    assert buckets[1].overflow_bkt == buckets[2]
+    assert buckets[0].withdraw_begin == datetime(2019, 1, 1)
+
+
+def test_run_scenario(spec):
+    fill_times, balances = run_scenario(spec, 1)
+
+    assert balances.tolist() == [100000, 200000, 200000]
+    assert fill_times[0] < fill_times[1]
+    assert fill_times[2] == np.iinfo(np.int64).max
+    assert (run_scenario(spec, 1)[0] == fill_times).all()
+
+
+def test_run_scenario_leaves_global_accounts(spec):
+    stored = len(Account.ACCOUNTS_STORAGE)
+    run_scenario(spec, 1)
+
+    assert len(Account.ACCOUNTS_STORAGE) == stored
+
+
+def test_run_monte_carlo(spec):
+    result = run_monte_carlo(spec, runs=12, seed=5, percentiles=(5, 50, 95), max_workers=2)
+
+    assert result.runs_fill_dates.shape == (12, 3)
+    assert list(result.fill_dates.index) == [5, 50, 95]
+    assert list(result.fill_dates.columns) == ['bkt_01', 'bkt_02', 'bkt_03']
+    assert result.fill_dates['bkt_01'][5] <= result.fill_dates['bkt_01'][95]
+    assert result.fill_dates['bkt_01'][50] < result.fill_dates['bkt_02'][50]
+    assert result.fill_dates['bkt_03'].isna().all()
+    assert result.fill_probability.tolist() == [1.0, 1.0, 0.0]
+    assert result.final_balances.loc[50].tolist() == [100000, 200000, 200000]
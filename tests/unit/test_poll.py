@@ -54,3 +54,25 @@ def test_vote_twice(poll, account):
 
     with pytest.raises(AccountCantVote):
         poll.vote_for(account)
+
+
+def test_vote_is_registered(poll, account):
+    poll.governance.can_vote = Mock(return_value=True)
+    poll.vote_against(account)
+
+    poll.governance.register_vote.assert_called_once_with(poll, account, False)
+    assert poll.voters == {account}
+
+
+def test_vote_many(poll, generate_accounts):
+    first, second, outsider = generate_accounts(3)
+    poll.governance.can_vote_many = Mock(side_effect=lambda accounts: [a is not outsider for a in accounts])
+    poll.vote_many([first], in_favor=True)
+
+    rejected = poll.vote_many([second, outsider, first, second], in_favor=False)
+
+    assert rejected == [outsider, first, second]
+    assert poll.votes_for == [first]
+    assert poll.votes_against == [second]
+    assert poll.voters == {first, second}
+    poll.governance.register_votes.assert_called_with(poll, [second], False)
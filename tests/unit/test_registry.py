@@ -0,0 +1,84 @@
+import gc
+from threading import Thread
+
+from models.account import Account
+from models.registry import Registry, current_registry
+from models.tokens import ERC20Token
+
+
+def test_counter_addresses():
+    with Registry() as registry:
+        first, second = Account(), ERC20Token()
+
+    assert first.address.endswith('0' * 24)
+    assert int(second.address, 16) == int(first.address, 16) + 1
+    assert second.index == first.index + 1
+    assert dict(registry) == {first.address: first, second.address: second}
+    assert first.address not in Account.ACCOUNTS_STORAGE
+
+
+def test_registries_keep_accounts_apart():
+    with Registry():
+        first = Account()
+    with Registry():
+        second = Account()
+
+    assert first.address != second.address
+    assert first.index != second.index
+
+
+def test_seeded_addresses_are_deterministic():
+    def addresses(seed):
+        with Registry(seed=seed):
+            return [Account().address for _ in range(3)]
+
+    assert addresses(42) == addresses(42)
+    assert addresses(42) != addresses(43)
+    assert len(set(addresses(b'seed'))) == 3
+    assert len(addresses(42)[0]) == 42
+
+
+def test_lookup_uses_active_registry(account):
+    assert Account.lookup(account.address) is account
+
+    with Registry():
+        inner = Account()
+        assert Account.lookup(inner.address) is inner
+
+    assert current_registry() is None
+    assert Account.lookup(account.address) is account
+
+
+def test_nested_activation():
+    outer, inner = Registry(), Registry()
+
+    with outer:
+        with inner:
+            assert current_registry() is inner
+        assert current_registry() is outer
+
+
+def test_weak_registry_drops_accounts():
+    with Registry(weak=True) as registry:
+        kept = Account()
+        Account()
+    gc.collect()
+
+    assert list(registry.values()) == [kept]
+
+
+def test_registries_are_scoped_per_thread():
+    registry = Registry()
+    seen = []
+
+    def create():
+        seen.append(current_registry())
+        Account()
+
+    with registry:
+        thread = Thread(target=create)
+        thread.start()
+        thread.join()
+
+    assert seen == [None]
+    assert len(registry) == 0
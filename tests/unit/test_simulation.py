@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+import pytest
+
+from models.clock import SimulatedClock
+from models.simulation import Simulator, EventInPast
+
+
+@pytest.fixture
+def simulator():
+    return Simulator(SimulatedClock(datetime(2019, 1, 1)))
+
+
+def test_events_run_in_time_order(simulator):
+    calls = []
+    simulator.schedule(datetime(2019, 3, 1), calls.append, 'march')
+    simulator.schedule(datetime(2019, 2, 1), calls.append, 'february')
+    simulator.schedule(datetime(2019, 2, 1), calls.append, 'february again')
+
+    assert simulator.run() == 3
+    assert calls == ['february', 'february again', 'march']
+    assert simulator.clock.now() == datetime(2019, 3, 1)
+
+
+def test_run_until(simulator):
+    calls = []
+    simulator.schedule(datetime(2019, 2, 1), calls.append, 1)
+    simulator.schedule(datetime(2019, 4, 1), calls.append, 2)
+
+    assert simulator.run(until=datetime(2019, 3, 1)) == 1
+    assert calls == [1]
+    assert simulator.clock.now() == datetime(2019, 3, 1)
+
+
+def test_schedule_in_past(simulator):
+    simulator.clock.move_to(datetime(2019, 2, 1))
+
+    with pytest.raises(EventInPast):
+        simulator.schedule(datetime(2019, 1, 15), print)
+
+
+def test_schedule_every(simulator):
+    moments = []
+    simulator.schedule_every(
+        datetime(2019, 1, 1), timedelta(days=7),
+        lambda: moments.append(simulator.clock.now()), until=datetime(2019, 1, 31))
+
+    simulator.run()
+
+    assert moments == [datetime(2019, 1, 1) + timedelta(days=7 * i) for i in range(5)]
+    assert len(simulator.queue) == 0
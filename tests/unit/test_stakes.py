@@ -0,0 +1,53 @@
+import pytest
+
+from models.stakes import StakeHistory
+
+
+@pytest.fixture
+def history(generate_accounts):
+    history = StakeHistory()
+    first, second = generate_accounts(2)
+
+    history.record(first, 100, (100, 1))
+    history.record(first, 150, (150, 1))
+    before = history.snapshot()
+    history.record(second, 50, (200, 2))
+    middle = history.snapshot()
+    history.snapshot()
+    history.record(first, 0, (50, 2))
+
+    return history, first, second, before, middle
+
+
+def test_stake_at(history):
+    history, first, second, before, middle = history
+
+    assert history.stake_at(first, before) == 150
+    assert history.stake_at(second, before) == 0
+    assert history.stake_at(second, middle) == 50
+    assert history.stake_at(first, middle + 1) == 150
+    assert history.stake_at(first, history.snapshot_id) == 0
+    assert [list(changes) for changes in history.accounts[first]] == [[0, 3], [150, 0]]
+
+
+def test_total_at(history):
+    history, _, _, before, middle = history
+
+    assert history.total_at(before) == (150, 1)
+    assert history.total_at(middle) == (200, 2)
+    assert history.total_at(history.snapshot_id) == (50, 2)
+
+
+def test_copy_is_independent(history):
+    history, first, second, before, _ = history
+    twin = history.copy()
+
+    twin.record(first, 500, (550, 2))
+
+    assert twin.stake_at(first, twin.snapshot_id) == 500
+    assert history.stake_at(first, history.snapshot_id) == 0
+    assert twin.stake_at(first, before) == 150
+
+    history.record(first, 10, (60, 2))
+    assert twin.stake_at(first, twin.snapshot_id) == 500
+    assert history.accounts[second] is twin.accounts[second]
@@ -2,6 +2,7 @@ from datetime import datetime, timedelta
 from unittest.mock import Mock
 import pytest
 
+from models.clock import SimulatedClock
 from models.dao import Tap
 
 
@@ -94,3 +95,18 @@ def test_tap_withdraw_all(tap, freezer):
     assert tap.last_withdraw == datetime.now()
     assert tap.excess_amount == 0
     assert tap.total_available == 0
+
+
+def test_tap_withdraw_w_simulated_clock(account, bucket):
+    clock = SimulatedClock(datetime(2019, 1, 1))
+    tap = Tap(withdrawer=account, bucket=bucket, rate=10, clock=clock)
+    tap.activate()
+    clock.advance(100)
+
+    assert tap.total_available == 1000
+
+    tap.withdraw(400)
+
+    tap.bucket.withdraw.assert_called_once_with(tap.withdrawer, 400)
+    assert tap.last_withdraw == datetime(2019, 1, 1, 0, 1, 40)
+    assert tap.total_available == 600
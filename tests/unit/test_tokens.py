@@ -1,7 +1,10 @@
 import pytest
 
+from benchmarks.memory import run_ledgers
+from models.account import Account
+from models.registry import AddressCollision, Registry
 from models.tokens import ERC20Token, TingesToken, \
-    DAIStableCoin, USDTStableCoin
+    DAIStableCoin, USDTStableCoin, IndexedERC20Token, IndexedTingesToken
 
 
 @pytest.fixture
@@ -50,3 +53,125 @@ def test_tinges_token():
 
 def test_dai_stablecoin():
     assert DAIStableCoin().name == 'DAI'
+
+
+@pytest.fixture
+def indexed_token():
+    return IndexedERC20Token()
+
+
+def test_indexed_token_creation(indexed_token):
+    assert indexed_token.balances == {}
+    assert indexed_token.total_supply == 0
+    assert IndexedTingesToken().name == 'TNG'
+
+
+def test_indexed_mint_and_transfer(indexed_token, generate_accounts):
+    sender, receiver, other = generate_accounts(3)
+
+    indexed_token.mint(sender, 1000)
+    indexed_token.transfer(sender, receiver, 300)
+
+    assert indexed_token.balance_of(sender) == 700
+    assert indexed_token.balance_of(receiver) == 300
+    assert indexed_token.balance_of(other) == 0
+    assert indexed_token.total_supply == 1000
+    assert indexed_token.balances == {sender.address: 700, receiver.address: 300}
+
+
+def test_indexed_insufficient_tokens_for_transfer(indexed_token, generate_accounts):
+    sender, receiver = generate_accounts(2)
+
+    with pytest.raises(AssertionError, match='Insufficient tokens for transfer'):
+        indexed_token.transfer(sender, receiver, 1)
+
+    indexed_token.mint(sender, 500)
+
+    with pytest.raises(AssertionError, match='Insufficient tokens for transfer'):
+        indexed_token.transfer(sender, receiver, 1000)
+
+    assert indexed_token.balance_of(sender) == 500
+    assert indexed_token.balance_of(receiver) == 0
+
+
+def test_indexed_storage_grows_with_holders(indexed_token, generate_accounts):
+    accounts = generate_accounts(1000)
+
+    indexed_token.mint(accounts[-1], 10)
+    indexed_token.transfer(accounts[-1], accounts[-2], 4)
+
+    assert sum(page is not None for page in indexed_token.balances.pages) <= 2
+    assert indexed_token.balances.addresses is None
+    assert indexed_token.balances[accounts[-1].address] == 6
+
+    addresses = indexed_token.balances.addresses
+    indexed_token.mint(accounts[0], 1)
+
+    assert indexed_token.balances[accounts[0].address] == 1
+    assert indexed_token.balances.addresses is addresses
+
+
+def test_indexed_address_collision(indexed_token):
+    with Registry(seed=1):
+        first = Account()
+    with Registry(seed=1):
+        second = Account()
+
+    indexed_token.mint(first, 10)
+    indexed_token.transfer(first, second, 5)
+
+    assert [indexed_token.balance_of(a) for a in (first, second)] == [5, 5]
+    with pytest.raises(AddressCollision):
+        indexed_token.balances[first.address]
+
+
+@pytest.fixture(params=[ERC20Token, IndexedERC20Token])
+def any_token(request):
+    return request.param()
+
+
+def test_mint_many(any_token, generate_accounts):
+    accounts = generate_accounts(3)
+
+    any_token.mint_many(accounts + accounts[:1], [100, 200, 300, 50])
+
+    assert [any_token.balance_of(a) for a in accounts] == [150, 200, 300]
+    assert any_token.total_supply == 650
+
+
+def test_transfer_many(any_token, generate_accounts):
+    first, second, third = generate_accounts(3)
+    any_token.mint_many([first, second], [1000, 500])
+
+    any_token.transfer_many([first, first, second], [second, third, third], [300, 200, 500])
+
+    assert [any_token.balance_of(a) for a in (first, second, third)] == [500, 300, 700]
+    assert any_token.total_supply == 1500
+
+
+def test_transfer_many_is_atomic(any_token, generate_accounts):
+    first, second, third = generate_accounts(3)
+    any_token.mint_many([first, second], [1000, 500])
+
+    with pytest.raises(AssertionError, match='Insufficient tokens for transfer'):
+        any_token.transfer_many([first, second, second], [third, third, first], [100, 300, 300])
+
+    with pytest.raises(AssertionError, match='Insufficient tokens for transfer'):
+        any_token.transfer_many([first, third], [second, first], [100, 1])
+
+    assert [any_token.balance_of(a) for a in (first, second, third)] == [1000, 500, 0]
+
+
+def test_transfer_many_w_zero_amount_from_non_holder(any_token, generate_accounts):
+    first, second, third = generate_accounts(3)
+    any_token.mint(first, 100)
+
+    any_token.transfer_many([first, second], [third, third], [40, 0])
+
+    assert [any_token.balance_of(a) for a in (first, second, third)] == [60, 0, 40]
+
+
+def test_indexed_ledger_takes_less_memory_than_dict():
+    ledgers = run_ledgers(holders=20000)
+
+    assert ledgers['indexed_per_holder'] < ledgers['dict_per_holder'] / 2
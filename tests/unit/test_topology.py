@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+
+from models.dao import Bucket
+from models.topology import InflowInPast
+
+
+@pytest.fixture
+def chain(build_chain, dai_stablecoin):
+    _, buckets = build_chain([1000, 2000, 3000, 4000], token=dai_stablecoin,
+                             withdraw_begin=datetime.now() - timedelta(days=1))
+    return buckets
+
+
+def test_compile(chain):
+    compiled = chain[0].compile()
+
+    assert compiled.buckets == chain
+    assert compiled.inflow == 0
+    assert compiled.boundaries == [1000, 3000, 6000]
+
+
+def test_holdings(chain):
+    compiled = chain[0].compile()
+
+    assert compiled.holdings(0) == [0, 0, 0, 0]
+    assert compiled.holdings(2500) == [1000, 1500, 0, 0]
+    assert compiled.holdings(3000) == [1000, 2000, 0, 0]
+    assert compiled.holdings(9000) == [1000, 2000, 3000, 3000]
+
+
+def test_filling_bucket(chain):
+    compiled = chain[0].compile()
+
+    assert compiled.filling_bucket(999) == chain[0]
+    assert compiled.filling_bucket(1000) == chain[1]
+    assert compiled.filling_bucket(10 ** 9) == chain[3]
+
+
+def test_many_inflows(chain):
+    compiled = chain[0].compile()
+    inflows = [0, 999, 2500, 9000]
+
+    assert compiled.filling_index_many(inflows).tolist() == [0, 0, 1, 3]
+    assert compiled.holdings_many(inflows).tolist() == [compiled.holdings(x) for x in inflows]
+
+
+def test_matches_flush(dai_stablecoin, chain):
+    compiled = chain[0].compile()
+    expected = compiled.holdings_many(np.arange(0, 8000, 250))
+
+    for row in expected[1:]:
+        dai_stablecoin.mint(chain[0], 250)
+        chain[0].flush()
+
+        assert [dai_stablecoin.balance_of(b) for b in chain] == row.tolist()
+
+
+def test_sync_after_withdraw(dai_stablecoin, chain, account):
+    compiled = chain[0].compile()
+    dai_stablecoin.mint(chain[0], 2500)
+    chain[0].flush()
+
+    chain[0].withdraw(account, 400)
+
+    assert compiled.holdings(2500) == [600, 1500, 0, 0]
+    assert compiled.inflow == 2500
+    assert compiled.holdings(3000) == [1000, 1600, 0, 0]
+
+    with pytest.raises(InflowInPast):
+        compiled.holdings(2000)
+
+
+def test_unbounded_middle_bucket(dai_stablecoin):
+    first = Bucket(name='First', withdraw_begin=datetime.now(), token=dai_stablecoin)
+    second = Bucket(name='Second', withdraw_begin=datetime.now(), token=dai_stablecoin)
+    first.set_overflow_bucket(second)
+
+    assert first.compile().holdings_many([10 ** 12]).tolist() == [[10 ** 12, 0]]
+
+
+def test_other_chains_keep_compiled_chain(dai_stablecoin, chain, account):
+    compiled = chain[0].compile()
+    version = compiled.version
+    other = Bucket(name='Other', withdraw_begin=datetime.now() - timedelta(days=1), token=dai_stablecoin)
+    dai_stablecoin.mint(other, 100)
+
+    other.withdraw(account, 50)
+    other.set_overflow_bucket(Bucket(name='Other child', withdraw_begin=None, token=dai_stablecoin))
+    compiled.holdings(0)
+
+    assert compiled.version is version
+
+    chain[3].set_overflow_bucket(other)
+
+    assert compiled.filling_bucket(10 ** 9) == other
+    assert other.chain_version is chain[0].chain_version